@@ -0,0 +1,218 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger("ortofix.cache")
+
+_NAO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar_pergunta(texto):
+    """
+    Gera a chave do cache: sem acentos, minúsculas, sem pontuação e com os
+    espaços reduzidos a um só. Os espaços entre palavras são mantidos de
+    propósito, senão "por que" e "porque" virariam a mesma pergunta.
+    """
+    sem_acentos = "".join(
+        c for c in unicodedata.normalize("NFKD", texto)
+        if not unicodedata.combining(c)
+    )
+    return _NAO_ALFANUMERICO.sub(" ", sem_acentos.casefold()).strip()
+
+
+def _executar_direto(fn, *args):
+    return fn(*args)
+
+
+class _Voo:
+    """Uma pergunta sendo respondida pelo Gemini, aguardada por outras sessões."""
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.resposta = None
+        self.erro = None
+
+
+class AnswerCache:
+    """
+    Cache de respostas para perguntas repetidas.
+
+    - Camada em memória com LRU (`max_entries`) e expiração (`ttl` segundos).
+    - Camada opcional em disco (sqlite em `db_path`), que sobrevive a reinícios.
+      As chamadas ao sqlite bloqueiam, então rodam via `executor`
+      (ex.: eventlet.tpool.execute) e nunca com o lock da memória.
+    - Perguntas iguais que chegam enquanto a primeira ainda está no Gemini
+      esperam por ela em vez de gerar outra chamada (coalescência).
+    """
+    def __init__(self, max_entries=2000, ttl=86400, db_path=None, clock=time.time,
+                 executor=None):
+        """
+        Args:
+            max_entries (int): Respostas guardadas em memória.
+            ttl (float): Validade de uma resposta, em segundos.
+            db_path (str): Arquivo sqlite da camada em disco (None desativa).
+            clock (callable): Relógio em segundos desde a época (injetável para testes).
+            executor (callable): Roda as chamadas ao sqlite fora do loop
+                (ex.: eventlet.tpool.execute); por padrão chama direto.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._executor = executor or _executar_direto
+        self._lock = threading.Lock()
+        self._lock_db = threading.Lock()
+        self._memoria = OrderedDict()
+        self._em_andamento = {}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # Com WAL, NORMAL não força fsync a cada commit; perder a última
+            # resposta numa queda de energia só custa uma chamada ao Gemini
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS respostas ("
+                "chave TEXT PRIMARY KEY, resposta TEXT NOT NULL, criado_em REAL NOT NULL)"
+            )
+            self._db.commit()
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.coalescidas = 0
+        self.misses = 0
+
+    def _executar_db(self, fn, *args):
+        # O lock fica com o greenlet chamador; o executor só faz o trabalho bloqueante
+        with self._lock_db:
+            return self._executor(fn, *args)
+
+    def _ler_memoria(self, chave):
+        """Chamado com self._lock."""
+        entrada = self._memoria.get(chave)
+        if entrada is not None:
+            resposta, criado_em = entrada
+            if self._clock() - criado_em <= self.ttl:
+                self._memoria.move_to_end(chave)
+                return resposta
+            del self._memoria[chave]
+        return None
+
+    def _ler_disco(self, chave):
+        """Procura no disco e, se achar, sobe a resposta para a memória."""
+        if self._db is None:
+            return None
+        try:
+            linha = self._executar_db(self._buscar, chave, self._clock() - self.ttl)
+        except sqlite3.Error as e:
+            logger.warning("erro_lendo_cache chave=%r erro=%s", chave, e)
+            return None
+        if linha is None:
+            return None
+        with self._lock:
+            self._guardar_memoria(chave, linha[0], linha[1])
+        return linha[0]
+
+    def _buscar(self, chave, minimo):
+        return self._db.execute(
+            "SELECT resposta, criado_em FROM respostas WHERE chave = ? AND criado_em >= ?",
+            (chave, minimo)
+        ).fetchone()
+
+    def _gravar(self, chave, resposta, agora):
+        self._db.execute(
+            "INSERT OR REPLACE INTO respostas (chave, resposta, criado_em) VALUES (?, ?, ?)",
+            (chave, resposta, agora)
+        )
+        self._db.commit()
+
+    def _guardar_memoria(self, chave, resposta, criado_em):
+        self._memoria[chave] = (resposta, criado_em)
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_entries:
+            self._memoria.popitem(last=False)
+
+    def get(self, chave):
+        with self._lock:
+            resposta = self._ler_memoria(chave)
+        return resposta if resposta is not None else self._ler_disco(chave)
+
+    def put(self, chave, resposta):
+        agora = self._clock()
+        with self._lock:
+            self._guardar_memoria(chave, resposta, agora)
+        if self._db is not None:
+            self._executar_db(self._gravar, chave, resposta, agora)
+
+    def get_or_compute(self, chave, calcular):
+        """
+        Retorna (resposta, origem). Se a chave não estiver no cache, chama
+        calcular() uma única vez mesmo com várias sessões pedindo ao mesmo
+        tempo; as outras esperam e recebem a mesma resposta.
+
+        origem é "memoria", "disco", "coalescida" ou "upstream".
+        """
+        with self._lock:
+            resposta = self._ler_memoria(chave)
+            if resposta is not None:
+                self.hits_memoria += 1
+                return resposta, "memoria"
+
+            voo = self._em_andamento.get(chave)
+            lider = voo is None
+            if lider:
+                voo = _Voo()
+                self._em_andamento[chave] = voo
+            else:
+                self.coalescidas += 1
+
+        if not lider:
+            voo.pronto.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resposta, "coalescida"
+
+        try:
+            # Só o líder consulta o disco; quem chegar junto espera por ele
+            origem = "disco"
+            voo.resposta = self._ler_disco(chave)
+            if voo.resposta is None:
+                origem = "upstream"
+                voo.resposta = calcular()
+        except Exception as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+                if voo.erro is None:
+                    if origem == "disco":
+                        self.hits_disco += 1
+                    else:
+                        self.misses += 1
+                        if voo.resposta:
+                            agora = self._clock()
+                            self._guardar_memoria(chave, voo.resposta, agora)
+            voo.pronto.set()
+
+        if origem == "upstream" and voo.resposta and self._db is not None:
+            # A resposta já está pronta; falhar ao guardá-la no disco não é erro do turno
+            try:
+                self._executar_db(self._gravar, chave, voo.resposta, agora)
+            except Exception as e:
+                logger.warning("erro_gravando_cache chave=%r erro=%s", chave, e)
+        return voo.resposta, origem
+
+    def stats(self):
+        with self._lock:
+            hits = self.hits_memoria + self.hits_disco
+            return {
+                "entradas_memoria": len(self._memoria),
+                "disco": self._db is not None,
+                "hits_memoria": self.hits_memoria,
+                "hits_disco": self.hits_disco,
+                "coalescidas": self.coalescidas,
+                "misses": self.misses,
+                "chamadas_economizadas": hits + self.coalescidas,
+            }
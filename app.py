@@ -2,56 +2,35 @@ import eventlet
 eventlet.monkey_patch()
 
 # Importações principais e do Flask/SocketIO
-from flask import Flask, request, session, jsonify # Adicionado jsonify
+from flask import Flask, request, session, jsonify, Response # Adicionado jsonify
 from flask_socketio import SocketIO, emit
-from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-from uuid import uuid4
+from uuid import uuid4, UUID
+from eventlet import tpool
+from answer_cache import AnswerCache, normalizar_pergunta
+from conversation_log import ConversationLog, agora_iso
+from dispatcher import UpstreamDispatcher, FilaCheiaError
+from key_manager import KeyManager, QuotaExcedidaError
+from metrics import Registry
+from ortografia import preparar_indice, responder_localmente
+from session_registry import HistoryPolicy
+from session_store import criar_session_store
+import atexit
+import logging
 import os
 import re
-import ast
-
-# ---------------- KEY MANAGER (REDUZIDO PARA CLAREZA NO ARQUIVO PRINCIPAL) ----------------
-# A classe KeyManager é definida aqui. (O código foi mantido, apenas movido para a ordem correta)
-class KeyManager:
-    """
-    Gerencia um pool de chaves de API, permitindo a troca para a próxima
-    chave disponível em caso de falha ou uso excessivo.
-    """
-    def __init__(self, key_env_var="GEMINI_API_KEYS"):
-        load_dotenv()
-        self.keys = self._load_keys(key_env_var)
-        self.current_key_index = 0
-        if not self.keys:
-            raise ValueError("Nenhuma chave de API encontrada na variável de ambiente.")
-
-    def _load_keys(self, key_env_var):
-        keys_str = os.getenv(key_env_var)
-        if keys_str:
-            try:
-                return ast.literal_eval(keys_str)
-            except (ValueError, SyntaxError) as e:
-                print(f"Erro ao ler as chaves do .env: {e}")
-                return []
-        return []
-
-    def get_current_key(self):
-        return self.keys[self.current_key_index]
-
-    def switch_key(self):
-        if len(self.keys) > 1:
-            self.current_key_index = (self.current_key_index + 1) % len(self.keys)
-            print(f"🔑 Chave de API trocada. Agora usando índice {self.current_key_index}")
-        else:
-            print("⚠️ Apenas uma chave disponível, não há outra para trocar.")
-
-    def get_all_keys(self):
-        return self.keys
-# ---------------- FIM DO KEY MANAGER ----------------
+import time
 
 load_dotenv()
 
+# -------- Logs estruturados (chave=valor). ORTOFIX_LOG_LEVEL=WARNING desliga os logs de INFO --------
+logging.basicConfig(
+    level=os.getenv("ORTOFIX_LOG_LEVEL", "INFO").upper(),
+    format="ts=%(asctime)s nivel=%(levelname)s logger=%(name)s %(message)s"
+)
+logger = logging.getLogger("ortofix")
+
 instrucoes = """Você é o OrtoFix, um assistente virtual amigável, especialista em ortografia da Língua Portuguesa, e foi criado para ajudar alunos do ensino fundamental e médio. Sua principal função é tirar dúvidas de forma clara, objetiva e educativa.
 
 Sua persona deve ser a do mascote OrtoFix: paciente, encorajador e divertido.
@@ -67,104 +46,505 @@ Quando um aluno fizer uma pergunta, siga estas regras:
 Se o aluno fizer uma pergunta sobre assuntos que não sejam de ortografia, responda de forma educada que sua especialidade é a ortografia da Língua Portuguesa e que você não tem conhecimento sobre o assunto. Só fale olá no começo da conversa, depois que o aluno estiver falando com você nao precisa ficar falando olá toda hora que começar uma nova frase. DE FORMA ALGUMA coloque ASTERISCOS nas respostas, volte apenas o texto. A RESPOSTA NAO PODE TER ASTERISCOS, TIRE TODOS OS ASTERISCOS POSSIVEIS
 """
 
-# -------- Inicializa KeyManager e client --------
-key_manager = KeyManager()
-client = genai.Client(api_key=key_manager.get_current_key())
-# ------------------------------------------------
+# -------- Inicializa KeyManager (um client por chave, criado sob demanda) --------
+key_manager = KeyManager(
+    rpm=float(os.getenv("GEMINI_RPM_POR_CHAVE", "15")),
+    max_wait=float(os.getenv("GEMINI_ESPERA_MAXIMA_CHAVE", "10"))
+)
+# ---------------------------------------------------------------------------------
 
 # ---------------- INICIALIZAÇÃO DO FLASK E SOCKETIO ----------------
 app = Flask(__name__) # AGORA O 'app' ESTÁ DEFINIDO PRIMEIRO
-app.secret_key = "chave"
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Com vários workers/máquinas todos precisam da mesma FLASK_SECRET_KEY
+app.secret_key = os.getenv("FLASK_SECRET_KEY", "chave")
+# SOCKETIO_MESSAGE_QUEUE (ex.: redis://localhost:6379/0) faz um emit chegar ao
+# cliente mesmo que ele esteja conectado a outro worker
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    message_queue=os.getenv("SOCKETIO_MESSAGE_QUEUE") or None
+)
+
+# Histórico de cada chat por session_id, com limite de sessões, expiração por inatividade e
+# remoção depois que o aluno desconecta. ORTOFIX_SESSION_STORE escolhe onde ele fica:
+# "memoria" (padrão, um worker só), "sqlite:///arquivo.db" ou "redis://host:porta/db"
+# (ver session_store.py)
+active_chats = criar_session_store(
+    os.getenv("ORTOFIX_SESSION_STORE"),
+    max_entries=int(os.getenv("ORTOFIX_MAX_SESSOES", "1000")),
+    ttl=float(os.getenv("ORTOFIX_SESSAO_TTL", "1800")),
+    disconnect_grace=float(os.getenv("ORTOFIX_GRACA_DESCONEXAO", "120")),
+    executor=tpool.execute
+)
+# Limita quantos turnos/tokens de histórico são reenviados ao modelo
+history_policy = HistoryPolicy(
+    max_turns=int(os.getenv("ORTOFIX_MAX_TURNOS", "10")),
+    max_tokens=int(os.getenv("ORTOFIX_MAX_TOKENS_HISTORICO", "3000"))
+)
+
+# Com streaming ativo o bot responde em pedaços ('nova_mensagem_parcial' + 'nova_mensagem_fim').
+# Use ORTOFIX_STREAMING=0 para voltar ao evento único 'nova_mensagem'.
+STREAMING_ATIVO = os.getenv("ORTOFIX_STREAMING", "1") != "0"
+
+# ---------------- MÉTRICAS (expostas em /metrics no formato do Prometheus) ----------------
+metricas = Registry()
+MENSAGENS = metricas.counter(
+    "ortofix_mensagens_total", "Mensagens respondidas, por origem da resposta.", ["origem"])
+ERROS = metricas.counter(
+    "ortofix_erros_total", "Mensagens que terminaram em erro, por tipo.", ["tipo"])
+LATENCIA_MENSAGEM = metricas.histogram(
+    "ortofix_latencia_mensagem_segundos", "Tempo do recebimento da mensagem até o fim da resposta.")
+LATENCIA_GEMINI = metricas.histogram(
+    "ortofix_latencia_gemini_segundos", "Duração de cada chamada ao Gemini, por resultado.", ["resultado"])
+LATENCIA_PRIMEIRO_PEDACO = metricas.histogram(
+    "ortofix_latencia_primeiro_pedaco_segundos",
+    "Tempo do pedido ao Gemini até o primeiro pedaço de texto (streaming).")
+ESPERA_FILA = metricas.histogram(
+    "ortofix_espera_fila_segundos", "Tempo esperando vaga no dispatcher.")
+TOKENS = metricas.counter(
+    "ortofix_tokens_total", "Tokens informados pelo usage_metadata do Gemini.", ["tipo"])
+SOCKETS_CONECTADOS = metricas.gauge(
+    "ortofix_sockets_conectados", "Sockets conectados a este worker.")
+
+# Responde localmente consultas simples de ortografia ("como se escreve X?", "X ou Y?")
+# sem chamar o Gemini (ver ortografia.py). ORTOFIX_RESPOSTA_LOCAL=0 desativa.
+RESPOSTA_LOCAL_ATIVA = os.getenv("ORTOFIX_RESPOSTA_LOCAL", "1") != "0"
+if RESPOSTA_LOCAL_ATIVA:
+    # Compila/abre a lista de palavras em segundo plano; o worker já atende enquanto isso
+    eventlet.spawn(preparar_indice, tpool.execute)
+
+# Limita as chamadas simultâneas ao Gemini e serializa os turnos de cada sessão
+dispatcher = UpstreamDispatcher(
+    max_concurrent=int(os.getenv("ORTOFIX_MAX_CONCORRENTES", "8")),
+    max_waiting=int(os.getenv("ORTOFIX_MAX_FILA", "32")),
+    on_wait=ESPERA_FILA.observe
+)
+
+# Cache das respostas de primeiro turno (perguntas sem contexto de conversa).
+# ORTOFIX_CACHE_DB aponta um arquivo sqlite para o cache sobreviver a reinícios.
+answer_cache = None
+if os.getenv("ORTOFIX_CACHE", "1") != "0":
+    answer_cache = AnswerCache(
+        max_entries=int(os.getenv("ORTOFIX_CACHE_MAX", "2000")),
+        ttl=float(os.getenv("ORTOFIX_CACHE_TTL", "86400")),
+        db_path=os.getenv("ORTOFIX_CACHE_DB") or None,
+        executor=tpool.execute
+    )
+
+# Log de auditoria: um registro JSONL por mensagem, gravado em lotes por uma
+# thread de fundo (o handler só enfileira). ORTOFIX_LOG_CONVERSAS=0 desativa.
+conversation_log = None
+caminho_log_conversas = os.getenv("ORTOFIX_LOG_CONVERSAS", "logs/conversas.jsonl")
+if caminho_log_conversas not in ("", "0"):
+    try:
+        conversation_log = ConversationLog(
+            caminho_log_conversas,
+            max_queue=int(os.getenv("ORTOFIX_LOG_CONVERSAS_FILA", "10000")),
+            max_bytes=int(float(os.getenv("ORTOFIX_LOG_CONVERSAS_MAX_MB", "50")) * 1024 * 1024),
+            compress=os.getenv("ORTOFIX_LOG_CONVERSAS_GZIP", "1") != "0",
+            executor=tpool.execute
+        )
+        atexit.register(conversation_log.close)
+    except OSError as e:
+        logger.warning("log_conversas_desativado caminho=%s erro=%s", caminho_log_conversas, e)
+
+# Métricas lidas só na hora da coleta, a partir do estado que os componentes já guardam
+metricas.gauge(
+    "ortofix_sessoes_ativas", "Sessões de chat guardadas no store.",
+    funcao=lambda: len(active_chats) if hasattr(active_chats, "__len__") else None)
+metricas.gauge(
+    "ortofix_dispatcher_ativos", "Chamadas ao Gemini em andamento.",
+    funcao=lambda: dispatcher.stats()["ativos"])
+metricas.gauge(
+    "ortofix_dispatcher_aguardando", "Chamadas esperando vaga no dispatcher.",
+    funcao=lambda: dispatcher.stats()["aguardando"])
 
-active_chats = {}
+@metricas.coletor
+def coletar_chaves():
+    chaves = key_manager.stats()["chaves"]
+    linhas = []
+    for nome, campo, tipo, ajuda in (
+        ("ortofix_gemini_requisicoes_total", "requisicoes", "counter", "Chamadas feitas com cada chave."),
+        ("ortofix_gemini_429_total", "erros_429", "counter", "Respostas 429 recebidas por chave."),
+        ("ortofix_trocas_chave_total", "trocas", "counter", "Pedidos repetidos em outra chave após 429."),
+        ("ortofix_chave_cooldown_segundos", "cooldown_restante", "gauge", "Cooldown restante de cada chave."),
+    ):
+        linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+        linhas += [f'{nome}{{chave="{c["indice"]}"}} {c[campo]}' for c in chaves]
+    return linhas
+
+@metricas.coletor
+def coletar_cache():
+    if answer_cache is None:
+        return []
+    estado = answer_cache.stats()
+    linhas = ["# HELP ortofix_cache_total Consultas ao cache de respostas, por resultado.",
+              "# TYPE ortofix_cache_total counter"]
+    for resultado in ("hits_memoria", "hits_disco", "coalescidas", "misses"):
+        linhas.append(f'ortofix_cache_total{{resultado="{resultado}"}} {estado[resultado]}')
+    return linhas
+
+@metricas.coletor
+def coletar_log_conversas():
+    if conversation_log is None:
+        return []
+    estado = conversation_log.stats()
+    linhas = ["# HELP ortofix_log_conversas_total Registros do log de conversas, por destino.",
+              "# TYPE ortofix_log_conversas_total counter"]
+    for destino in ("escritos", "descartados", "fora_da_amostra"):
+        linhas.append(f'ortofix_log_conversas_total{{destino="{destino}"}} {estado[destino]}')
+    linhas += ["# HELP ortofix_log_conversas_na_fila Registros esperando gravação.",
+               "# TYPE ortofix_log_conversas_na_fila gauge",
+               f"ortofix_log_conversas_na_fila {estado['na_fila']}"]
+    return linhas
 
 # -------- ROTA PRINCIPAL PARA VERIFICAÇÃO DE SAÚDE DA API (Antigo 404) --------
 @app.route('/')
 def health_check():
     """Retorna um status JSON para indicar que a API está ativa (Resolve o 404)."""
     return jsonify({"status": "API Chatbot Online", "service": "OrtoFix API"}), 200
+
+@app.route('/chaves')
+def status_chaves():
+    """Mostra o uso, o orçamento e o cooldown de cada chave de API (chaves mascaradas)."""
+    return jsonify(key_manager.stats()), 200
+
+@app.route('/metrics')
+def metrics():
+    """Métricas no formato texto do Prometheus."""
+    return Response(metricas.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/cache')
+def status_cache():
+    """Mostra acertos, perdas e chamadas ao Gemini economizadas pelo cache de respostas."""
+    if answer_cache is None:
+        return jsonify({"ativo": False}), 200
+    return jsonify({"ativo": True, **answer_cache.stats()}), 200
 # -----------------------------------------------------------------------------
 
 # ---------------- FUNÇÃO PARA LIMPAR MARKDOWN ----------------
+_FORMATACAO = re.compile(r"[*_#`]")
+
 def limpar_formatacao(texto: str) -> str:
-    texto = re.sub(r"[*_#`]", "", texto)
+    texto = _FORMATACAO.sub("", texto)
     return texto.strip()
 
+class LimpadorStreaming:
+    """
+    Versão incremental de limpar_formatacao para respostas em streaming.
+    A remoção de asteriscos é feita caractere a caractere, então funciona em
+    qualquer pedaço; só o strip() precisa de estado: espaços no começo da
+    resposta são descartados e espaços no fim de um pedaço ficam retidos até
+    chegar mais texto (se a resposta acabar, nunca são enviados).
+    """
+    def __init__(self):
+        self._inicio = True
+        self._espacos_pendentes = ""
+
+    def alimentar(self, pedaco: str) -> str:
+        texto = _FORMATACAO.sub("", pedaco)
+        if self._inicio:
+            texto = texto.lstrip()
+            if not texto:
+                return ""
+            self._inicio = False
+        texto = self._espacos_pendentes + texto
+        conteudo = texto.rstrip()
+        self._espacos_pendentes = texto[len(conteudo):]
+        return conteudo
+
 # ---------------- CHAT ----------------
+def criar_chat(client, history=None):
+    return client.chats.create(
+        model="gemini-2.0-flash",
+        config=types.GenerateContentConfig(system_instruction=instrucoes),
+        history=history
+    )
+
 def get_user_chat():
+    """
+    Retorna o histórico do chat da sessão atual, criando a sessão se preciso.
+    O chat em si é montado a cada turno sobre o client da chave escolhida.
+    """
     if 'session_id' not in session:
         session['session_id'] = str(uuid4())
-        print(f"Nova sessão Flask criada: {session['session_id']}")
+        logger.debug("sessao_criada session_id=%s", session['session_id'])
 
     session_id = session['session_id']
 
-    if session_id not in active_chats:
-        print(f"Criando novo chat Gemini para session_id: {session_id}")
-        chat_session = client.chats.create(
-            model="gemini-2.0-flash",
-            config=types.GenerateContentConfig(system_instruction=instrucoes)
+    historico = active_chats.get(session_id)
+    if historico is None:
+        historico = []
+        active_chats.put(session_id, historico)
+        logger.debug("chat_criado session_id=%s", session_id)
+
+    return historico
+
+def salvar_historico(session_id, historico):
+    """
+    Guarda o histórico do turno que acabou de terminar. Se ele passou dos
+    limites da history_policy, guarda só os turnos recentes (e um resumo dos antigos).
+    """
+    historico = history_policy.juntar_pedacos(historico)
+    compactado = history_policy.compactar(historico)
+    if compactado is not None:
+        logger.info(
+            "historico_compactado session_id=%s antes=%d depois=%d",
+            session_id, len(historico), len(compactado)
         )
-        active_chats[session_id] = chat_session
-        print(f"Novo chat Gemini criado e armazenado para {session_id}")
+        historico = compactado
+    active_chats.put(session_id, historico)
+
+def processar_turno(mensagem_usuario, responder):
+    """
+    Executa um turno completo; roda dentro do dispatcher, já na vez da sessão.
+    Retorna o texto da resposta e o índice da chave que respondeu.
+    Um 429 chega antes do primeiro pedaço da resposta, então o key_manager
+    pode repetir o turno em outra chave sem o aluno perceber.
+    """
+    historico = get_user_chat()
+
+    def tentativa(client, indice_chave):
+        user_chat = criar_chat(client, history=historico)
+        inicio = time.perf_counter()
+        try:
+            resposta_texto = responder(user_chat, mensagem_usuario)
+        except Exception as e:
+            LATENCIA_GEMINI.observe(time.perf_counter() - inicio, type(e).__name__)
+            raise
+        LATENCIA_GEMINI.observe(time.perf_counter() - inicio, "ok")
+        return user_chat, resposta_texto, indice_chave
+
+    user_chat, resposta_texto, indice_chave = key_manager.call(tentativa)
+    salvar_historico(session.get('session_id'), user_chat.get_history(curated=True))
+    return resposta_texto, indice_chave
+
+def responder_mensagem(mensagem_usuario):
+    """
+    Responde uma mensagem do aluno e retorna (origem, resposta, índice da
+    chave). A origem é "local", "upstream", "memoria", "disco" ou "coalescida";
+    o índice da chave só existe quando esta mensagem chamou o Gemini.
+
+    A mensagem inteira roda dentro da vez da sessão no dispatcher, qualquer
+    que seja a origem da resposta: assim as respostas saem na ordem das
+    perguntas e dois turnos da mesma sessão nunca gravam o histórico ao mesmo
+    tempo. Só o primeiro turno de uma sessão passa pelo cache: depois disso
+    a resposta depende do contexto da conversa. Quem recebe a resposta
+    local, do cache ou de outra sessão com a mesma pergunta em andamento não
+    ocupa vaga global no dispatcher.
+    """
+    session_id = session['session_id']
+    responder = responder_em_streaming if STREAMING_ATIVO else responder_de_uma_vez
+
+    chamada = {}
+
+    def perguntar_ao_gemini():
+        resposta_texto, chamada["indice_chave"] = dispatcher.executar(
+            processar_turno, mensagem_usuario, responder)
+        return resposta_texto
+
+    with dispatcher.turno(session_id):
+        if RESPOSTA_LOCAL_ATIVA:
+            resposta_texto = responder_localmente(mensagem_usuario)
+            if resposta_texto is not None:
+                enviar_resposta_pronta(resposta_texto, "local")
+                registrar_turno_pronto(session_id, mensagem_usuario, resposta_texto)
+                return "local", resposta_texto, None
+
+        chave = normalizar_pergunta(mensagem_usuario) if answer_cache is not None else ""
+        if not chave or active_chats.get(session_id):
+            resposta_texto = perguntar_ao_gemini()
+            return "upstream", resposta_texto, chamada.get("indice_chave")
+
+        resposta_texto, origem = answer_cache.get_or_compute(chave, perguntar_ao_gemini)
+        if origem != "upstream":
+            enviar_resposta_pronta(resposta_texto, origem)
+            registrar_turno_pronto(session_id, mensagem_usuario, resposta_texto)
+        return origem, resposta_texto, chamada.get("indice_chave")
 
-    return active_chats[session_id]
+def registrar_turno_pronto(session_id, mensagem_usuario, resposta_texto):
+    """Acrescenta ao histórico um turno respondido sem o Gemini, para manter o contexto."""
+    salvar_historico(session_id, (active_chats.get(session_id) or []) + [
+        types.Content(role="user", parts=[types.Part(text=mensagem_usuario)]),
+        types.Content(role="model", parts=[types.Part(text=resposta_texto)]),
+    ])
+
+# ---------------- RESPOSTAS ----------------
+def responder_de_uma_vez(user_chat, mensagem_usuario):
+    """Espera a resposta completa do Gemini e envia um único 'nova_mensagem'."""
+    resposta_gemini = user_chat.send_message(mensagem_usuario)
+
+    resposta_texto = (
+        resposta_gemini.text
+        if hasattr(resposta_gemini, 'text')
+        else resposta_gemini.candidates[0].content.parts[0].text
+    )
+
+    resposta_texto = limpar_formatacao(resposta_texto)
+    registrar_tokens(resposta_gemini)
+
+    emit('nova_mensagem', {
+        "remetente": "bot",
+        "texto": resposta_texto,
+        "session_id": session.get('session_id')
+    })
+    return resposta_texto
+
+def responder_em_streaming(user_chat, mensagem_usuario):
+    """
+    Envia a resposta do Gemini pedaço a pedaço. Cada trecho já limpo vira um
+    'nova_mensagem_parcial'; no final um 'nova_mensagem_fim' traz o texto
+    completo e as latências (primeiro pedaço e total) em milissegundos.
+    """
+    session_id = session.get('session_id')
+    limpador = LimpadorStreaming()
+    partes = []
+    latencia_primeiro_chunk_ms = None
+    inicio = time.perf_counter()
+    ultimo_chunk = None
+
+    for chunk in user_chat.send_message_stream(mensagem_usuario):
+        ultimo_chunk = chunk
+        texto = limpador.alimentar(chunk.text or "")
+        if not texto:
+            continue
+        if latencia_primeiro_chunk_ms is None:
+            primeiro_pedaco = time.perf_counter() - inicio
+            LATENCIA_PRIMEIRO_PEDACO.observe(primeiro_pedaco)
+            latencia_primeiro_chunk_ms = round(primeiro_pedaco * 1000, 1)
+        partes.append(texto)
+        emit('nova_mensagem_parcial', {
+            "remetente": "bot",
+            "texto": texto,
+            "session_id": session_id
+        })
+
+    latencia_total_ms = round((time.perf_counter() - inicio) * 1000, 1)
+    registrar_tokens(ultimo_chunk)
+    logger.debug(
+        "resposta_streaming session_id=%s primeiro_pedaco_ms=%s total_ms=%s",
+        session_id, latencia_primeiro_chunk_ms, latencia_total_ms
+    )
+    emit('nova_mensagem_fim', {
+        "remetente": "bot",
+        "texto": "".join(partes),
+        "session_id": session_id,
+        "latencia_primeiro_chunk_ms": latencia_primeiro_chunk_ms,
+        "latencia_total_ms": latencia_total_ms
+    })
+    return "".join(partes)
+
+def registrar_tokens(resposta):
+    """Soma os tokens do usage_metadata (no streaming ele vem no último pedaço)."""
+    uso = getattr(resposta, 'usage_metadata', None)
+    if uso is None:
+        return
+    if uso.prompt_token_count:
+        TOKENS.inc("prompt", valor=uso.prompt_token_count)
+    if uso.candidates_token_count:
+        TOKENS.inc("resposta", valor=uso.candidates_token_count)
+
+def enviar_resposta_pronta(resposta_texto, origem):
+    """Envia de uma vez uma resposta que não veio do Gemini neste turno (ex.: cache)."""
+    payload = {
+        "remetente": "bot",
+        "texto": resposta_texto,
+        "session_id": session.get('session_id'),
+        "origem": origem
+    }
+    if STREAMING_ATIVO:
+        payload["latencia_primeiro_chunk_ms"] = None
+        payload["latencia_total_ms"] = None
+        emit('nova_mensagem_fim', payload)
+    else:
+        emit('nova_mensagem', payload)
 
 # ---------------- SOCKETS ----------------
+def session_id_valido(valor):
+    try:
+        return str(UUID(str(valor))) == valor
+    except ValueError:
+        return False
+
 @socketio.on('connect')
-def handle_connect():
-    print(f"Cliente conectado: {request.sid}")
+def handle_connect(auth=None):
+    logger.debug("cliente_conectado sid=%s", request.sid)
+    SOCKETS_CONECTADOS.inc()
     try:
+        # Numa reconexão o cliente manda o session_id que recebeu antes; assim a
+        # conversa continua mesmo que ele caia em outro worker ou máquina
+        session_id_anterior = (auth or {}).get('session_id') if isinstance(auth, dict) else None
+        if session_id_anterior and session_id_valido(session_id_anterior):
+            session['session_id'] = session_id_anterior
         get_user_chat()
         user_session_id = session.get('session_id', 'N/A')
+        active_chats.mark_connected(user_session_id)
         emit('status_conexao', {'data': 'Conectado com sucesso!', 'session_id': user_session_id})
     except Exception as e:
-        app.logger.error(f"Erro durante o evento connect para {request.sid}: {e}", exc_info=True)
+        logger.error("erro_connect sid=%s erro=%s", request.sid, e, exc_info=True)
         emit('erro', {'erro': 'Falha ao inicializar a sessão de chat no servidor.'})
 
 @socketio.on('enviar_mensagem')
 def handle_enviar_mensagem(data):
-    global client
+    inicio = time.perf_counter()
+    mensagem_usuario = origem = resposta_texto = indice_chave = erro = None
     try:
         mensagem_usuario = data.get("mensagem")
         if not mensagem_usuario:
+            ERROS.inc("mensagem_vazia")
             emit('erro', {"erro": "Mensagem não pode ser vazia."})
             return
 
         try:
-            user_chat = get_user_chat()
-            resposta_gemini = user_chat.send_message(mensagem_usuario)
-
-            resposta_texto = (
-                resposta_gemini.text
-                if hasattr(resposta_gemini, 'text')
-                else resposta_gemini.candidates[0].content.parts[0].text
-            )
-
-            resposta_texto = limpar_formatacao(resposta_texto)
-
-            emit('nova_mensagem', {
-                "remetente": "bot",
-                "texto": resposta_texto,
-                "session_id": session.get('session_id')
-            })
+            if 'session_id' not in session:
+                get_user_chat()
+            origem, resposta_texto, indice_chave = responder_mensagem(mensagem_usuario)
+            MENSAGENS.inc(origem)
 
+        except FilaCheiaError as e:
+            ERROS.inc("fila_cheia")
+            erro = "fila_cheia"
+            logger.warning("mensagem_recusada motivo=fila_cheia detalhe=%s", e)
+            emit('erro', {"erro": "O servidor está muito ocupado agora. Tente novamente em alguns segundos."})
+        except QuotaExcedidaError as e:
+            # Todas as chaves estão no limite (429) mesmo depois das novas tentativas
+            ERROS.inc("quota_excedida")
+            erro = "quota_excedida"
+            logger.warning("mensagem_recusada motivo=quota_excedida detalhe=%s", e)
+            emit('erro', {"erro": "Muitas perguntas ao mesmo tempo agora. Tente novamente em alguns segundos."})
         except Exception as e:
-            # Se for erro de quota/limite (ex.: 429 Too Many Requests)
-            if "429" in str(e) or "quota" in str(e).lower():
-                key_manager.switch_key()
-                client = genai.Client(api_key=key_manager.get_current_key())
-                emit('erro', {"erro": "Chave trocada automaticamente, tente novamente."})
-            else:
-                emit('erro', {"erro": f"Ocorreu um erro no servidor: {str(e)}"})
+            ERROS.inc(type(e).__name__)
+            erro = type(e).__name__
+            logger.warning("erro_upstream tipo=%s erro=%s", type(e).__name__, e)
+            emit('erro', {"erro": f"Ocorreu um erro no servidor: {str(e)}"})
 
     except Exception as e:
-        app.logger.error(f"Erro em handle_enviar_mensagem: {e}", exc_info=True)
+        ERROS.inc("inesperado")
+        erro = "inesperado"
+        logger.error("erro_inesperado erro=%s", e, exc_info=True)
         emit('erro', {"erro": f"Ocorreu um erro inesperado: {str(e)}"})
+    finally:
+        latencia = time.perf_counter() - inicio
+        LATENCIA_MENSAGEM.observe(latencia)
+        if conversation_log is not None and mensagem_usuario:
+            conversation_log.log({
+                "ts": agora_iso(),
+                "session_id": session.get('session_id'),
+                "mensagem": mensagem_usuario,
+                "resposta": resposta_texto,
+                "latencia_ms": round(latencia * 1000, 1),
+                "chave": indice_chave,
+                "origem": origem or "erro",
+                "erro": erro,
+            })
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    print(f"Cliente desconectado: {request.sid}, session_id: {session.get('session_id', 'N/A')}")
+    logger.debug("cliente_desconectado sid=%s session_id=%s", request.sid, session.get('session_id', 'N/A'))
+    SOCKETS_CONECTADOS.dec()
+    if 'session_id' in session:
+        # O chat continua disponível durante o período de graça, para reconexões rápidas
+        active_chats.mark_disconnected(session['session_id'])
 
 if __name__ == "__main__":
     # Comando de desenvolvimento local, ignorado pelo Gunicorn no Render
@@ -0,0 +1,135 @@
+"""
+Client falso do google-genai para testes de carga sem internet e sem gastar cota.
+
+Imita a parte do SDK que o app.py usa (client.chats.create, send_message,
+send_message_stream, get_history) e levanta os mesmos erros do SDK
+(errors.ClientError 429 e errors.ServerError 5xx). O comportamento é
+configurado por variáveis de ambiente, lidas quando o client é criado:
+
+    FAKE_GENAI_LATENCIA_MS          espera até o primeiro pedaço (padrão 300)
+    FAKE_GENAI_JITTER_MS            variação aleatória somada à latência (padrão 100)
+    FAKE_GENAI_PEDACOS              pedaços por resposta (padrão 8)
+    FAKE_GENAI_INTERVALO_PEDACO_MS  intervalo entre pedaços (padrão 40)
+    FAKE_GENAI_TAXA_429             fração das chamadas que recebe 429 (padrão 0)
+    FAKE_GENAI_TAXA_5XX             fração das chamadas que recebe 503 (padrão 0)
+    FAKE_GENAI_RETRY_DELAY_S        retryDelay informado no 429 (padrão 2)
+"""
+import os
+import random
+import time
+
+from google.genai import errors, types
+
+_RESPOSTA = (
+    "A forma correta é **exceção**, com ç. Palavras terminadas em -ção vêm de verbos "
+    "como excetuar. Exemplo: toda regra tem uma exceção. Continue praticando!"
+)
+
+
+class FakeConfig:
+    def __init__(self, **valores):
+        def ler(nome, padrao):
+            return float(valores.get(nome, os.getenv(f"FAKE_GENAI_{nome.upper()}", padrao)))
+        self.latencia_ms = ler("latencia_ms", 300)
+        self.jitter_ms = ler("jitter_ms", 100)
+        self.pedacos = max(1, int(ler("pedacos", 8)))
+        self.intervalo_pedaco_ms = ler("intervalo_pedaco_ms", 40)
+        self.taxa_429 = ler("taxa_429", 0)
+        self.taxa_5xx = ler("taxa_5xx", 0)
+        self.retry_delay_s = ler("retry_delay_s", 2)
+
+
+def _resposta(texto, usage=None):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(
+            content=types.Content(role="model", parts=[types.Part(text=texto)]),
+        )],
+        usage_metadata=usage,
+    )
+
+
+class FakeChat:
+    def __init__(self, config, history=None):
+        self._config = config
+        self._history = [
+            h if isinstance(h, types.Content) else types.Content.model_validate(h)
+            for h in (history or [])
+        ]
+
+    def _talvez_falhar(self):
+        sorteio = random.random()
+        if sorteio < self._config.taxa_429:
+            raise errors.ClientError(429, {"error": {
+                "code": 429,
+                "status": "RESOURCE_EXHAUSTED",
+                "message": "Resource has been exhausted (e.g. check quota).",
+                "details": [{
+                    "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                    "retryDelay": f"{self._config.retry_delay_s:g}s",
+                }],
+            }})
+        if sorteio < self._config.taxa_429 + self._config.taxa_5xx:
+            raise errors.ServerError(503, {"error": {
+                "code": 503, "status": "UNAVAILABLE", "message": "The model is overloaded.",
+            }})
+
+    def _esperar_primeiro_pedaco(self):
+        espera = self._config.latencia_ms + random.uniform(0, self._config.jitter_ms)
+        time.sleep(espera / 1000)
+
+    def _pedacos(self):
+        tamanho = -(-len(_RESPOSTA) // self._config.pedacos)
+        return [_RESPOSTA[i:i + tamanho] for i in range(0, len(_RESPOSTA), tamanho)]
+
+    def _uso(self, mensagem):
+        prompt = sum(
+            len(p.text or "") for c in self._history for p in (c.parts or [])
+        ) // 4 + len(mensagem) // 4
+        resposta = len(_RESPOSTA) // 4
+        return types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt,
+            candidates_token_count=resposta,
+            total_token_count=prompt + resposta,
+        )
+
+    def _registrar(self, mensagem):
+        self._history.append(types.Content(role="user", parts=[types.Part(text=mensagem)]))
+        self._history.append(types.Content(role="model", parts=[types.Part(text=_RESPOSTA)]))
+
+    def send_message(self, message, config=None):
+        self._talvez_falhar()
+        self._esperar_primeiro_pedaco()
+        time.sleep(self._config.intervalo_pedaco_ms * (self._config.pedacos - 1) / 1000)
+        resposta = _resposta(_RESPOSTA, self._uso(message))
+        self._registrar(message)
+        return resposta
+
+    def send_message_stream(self, message, config=None):
+        self._talvez_falhar()
+        self._esperar_primeiro_pedaco()
+        pedacos = self._pedacos()
+        uso = self._uso(message)
+        for i, pedaco in enumerate(pedacos):
+            if i:
+                time.sleep(self._config.intervalo_pedaco_ms / 1000)
+            yield _resposta(pedaco, uso if i == len(pedacos) - 1 else None)
+        self._registrar(message)
+
+    def get_history(self, curated=False):
+        return list(self._history)
+
+
+class _FakeChats:
+    def __init__(self, config):
+        self._config = config
+
+    def create(self, *, model, config=None, history=None):
+        return FakeChat(self._config, history)
+
+
+class FakeClient:
+    """Substituto de genai.Client; aceita os mesmos argumentos e ignora a chave."""
+    def __init__(self, api_key=None, **kwargs):
+        self.api_key = api_key
+        self.config = FakeConfig()
+        self.chats = _FakeChats(self.config)
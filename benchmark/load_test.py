@@ -0,0 +1,354 @@
+"""
+Teste de carga do OrtoFix com Gemini simulado.
+
+Sobe benchmark/servidor_fake.py (ou usa --url para um servidor já rodando),
+conecta N clientes python-socketio ao mesmo tempo e cada um faz
+connect -> vários 'enviar_mensagem' -> disconnect. No fim grava um JSON com
+vazão, latência ponta a ponta e do primeiro pedaço (p50/p95/p99), taxa de
+erros e memória (RSS) do servidor.
+
+Exemplos:
+    python -m benchmark.load_test --clientes 50 --turnos 5
+    FAKE_GENAI_TAXA_429=0.2 python -m benchmark.load_test --saida antes.json
+    python -m benchmark.load_test --url http://127.0.0.1:5000 --sem-servidor
+
+Compare dois resultados com:
+    python -m benchmark.load_test --comparar antes.json depois.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import requests
+import socketio
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PERGUNTAS = [
+    "Como se escreve exceção?",
+    "É mas ou mais?",
+    "Quando usar por que, porque, porquê e por quê?",
+    "É concerteza ou com certeza?",
+    "Exceção é com ç ou com ss?",
+    "Qual o certo: a gente ou agente?",
+    "Mal ou mau?",
+    "Onde ou aonde?",
+]
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    baixo = int(posicao)
+    alto = min(baixo + 1, len(ordenados) - 1)
+    return round(ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (posicao - baixo), 2)
+
+
+def resumo_latencias(valores):
+    return {
+        "n": len(valores),
+        "p50": percentil(valores, 50),
+        "p95": percentil(valores, 95),
+        "p99": percentil(valores, 99),
+        "max": round(max(valores), 2) if valores else None,
+        "media": round(sum(valores) / len(valores), 2) if valores else None,
+    }
+
+
+def rss_kb(pid):
+    """Memória residente do processo em KB (lida de /proc, só Linux)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class AmostradorRSS(threading.Thread):
+    def __init__(self, pid, intervalo=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.intervalo = intervalo
+        self.amostras = []
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.is_set():
+            valor = rss_kb(self.pid)
+            if valor is not None:
+                self.amostras.append(valor)
+            self._parar.wait(self.intervalo)
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+def roteiro_aleatorio(turnos, fracao_repetidas):
+    """Perguntas de um aluno simulado, sem pausa entre elas."""
+    roteiro = []
+    for _ in range(turnos):
+        pergunta = random.choice(PERGUNTAS)
+        if random.random() >= fracao_repetidas:
+            pergunta += f" ({random.randrange(10**9)})"
+        roteiro.append((0.0, pergunta))
+    return roteiro
+
+
+class ClienteSimulado:
+    """
+    Um aluno: espera `atraso_inicial` segundos, conecta, manda as mensagens
+    do roteiro (lista de (pausa_s, mensagem)) esperando cada resposta e desconecta.
+    """
+    def __init__(self, url, roteiro, timeout, transportes, atraso_inicial=0.0):
+        self.url = url
+        self.roteiro = roteiro
+        self.timeout = timeout
+        self.transportes = transportes
+        self.atraso_inicial = atraso_inicial
+        self.turnos_medidos = []
+        self.erros = {}
+        self._sio = socketio.Client(reconnection=False)
+        self._pronto = threading.Event()
+        self._inicio = None
+        self._primeiro = None
+        self._resultado = None
+        self._sio.on("nova_mensagem_parcial", self._parcial)
+        self._sio.on("nova_mensagem_fim", self._fim)
+        self._sio.on("nova_mensagem", self._fim)
+        self._sio.on("erro", self._erro)
+
+    def _parcial(self, data):
+        if self._primeiro is None:
+            self._primeiro = time.perf_counter()
+
+    def _fim(self, data):
+        if self._primeiro is None:
+            self._primeiro = time.perf_counter()
+        self._resultado = ("ok", data.get("origem") or "upstream")
+        self._pronto.set()
+
+    def _erro(self, data):
+        self._resultado = ("erro", data.get("erro", "desconhecido"))
+        self._pronto.set()
+
+    def _registrar_erro(self, tipo):
+        self.erros[tipo] = self.erros.get(tipo, 0) + 1
+
+    def conectar(self):
+        try:
+            self._sio.connect(self.url, transports=self.transportes, wait_timeout=self.timeout)
+            return True
+        except Exception as e:
+            self._registrar_erro(f"conexao: {type(e).__name__}")
+            return False
+
+    def enviar(self, mensagem):
+        """Manda uma mensagem e espera a resposta, medindo as latências."""
+        self._pronto.clear()
+        self._primeiro = None
+        self._resultado = None
+        self._inicio = time.perf_counter()
+        self._sio.emit("enviar_mensagem", {"mensagem": mensagem})
+        if not self._pronto.wait(self.timeout):
+            self._registrar_erro("timeout")
+            return
+        fim = time.perf_counter()
+        status, detalhe = self._resultado
+        if status == "erro":
+            self._registrar_erro(detalhe)
+            return
+        self.turnos_medidos.append({
+            "total_ms": (fim - self._inicio) * 1000,
+            "primeiro_byte_ms": (self._primeiro - self._inicio) * 1000,
+            "origem": detalhe,
+        })
+
+    def executar(self):
+        if self.atraso_inicial:
+            time.sleep(self.atraso_inicial)
+        if not self.conectar():
+            return
+        try:
+            for pausa, mensagem in self.roteiro:
+                if pausa > 0:
+                    time.sleep(pausa)
+                self.enviar(mensagem)
+        finally:
+            self._sio.disconnect()
+
+
+def esperar_servidor(url, timeout=20):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            if requests.get(url, timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu em {url} depois de {timeout}s.")
+
+
+@contextmanager
+def servidor(args):
+    """
+    Sobe o servidor falso (a não ser com --sem-servidor), espera ele responder
+    e mede a memória dele enquanto o bloco roda. Devolve (url, rss), onde rss
+    é preenchido com inicial/pico/final quando o bloco termina.
+    """
+    processo = None
+    url = args.url
+    rss = {"inicial": None, "pico": None, "final": None}
+    if not args.sem_servidor:
+        url = f"http://127.0.0.1:{args.porta}"
+        processo = subprocess.Popen(
+            [sys.executable, "-m", "benchmark.servidor_fake", "--porta", str(args.porta)],
+            cwd=RAIZ,
+            stdout=subprocess.DEVNULL if not args.verboso else None,
+            stderr=subprocess.DEVNULL if not args.verboso else None,
+        )
+    amostrador = None
+    try:
+        esperar_servidor(url)
+        if processo is not None:
+            rss["inicial"] = rss_kb(processo.pid)
+            amostrador = AmostradorRSS(processo.pid)
+            amostrador.start()
+        yield url, rss
+    finally:
+        if amostrador is not None:
+            amostrador.parar()
+            if amostrador.amostras:
+                rss["pico"] = max(amostrador.amostras)
+                rss["final"] = amostrador.amostras[-1]
+        if processo is not None:
+            processo.terminate()
+            processo.wait(timeout=10)
+
+
+def montar_relatorio(args, clientes, duracao, rss, parametros):
+    """Relatório em JSON (o mesmo formato lido por --comparar)."""
+    turnos = [t for c in clientes for t in c.turnos_medidos]
+    erros = {}
+    for cliente in clientes:
+        for tipo, quantidade in cliente.erros.items():
+            erros[tipo] = erros.get(tipo, 0) + quantidade
+    tentativas = len(turnos) + sum(erros.values())
+    origens = {}
+    for turno in turnos:
+        origens[turno["origem"]] = origens.get(turno["origem"], 0) + 1
+
+    return {
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "parametros": {
+            **parametros,
+            "transportes": args.transportes,
+            "fake_genai": {k: v for k, v in os.environ.items() if k.startswith("FAKE_GENAI_")},
+            "ortofix": {k: v for k, v in os.environ.items() if k.startswith(("ORTOFIX_", "GEMINI_RPM"))},
+        },
+        "duracao_s": round(duracao, 3),
+        "mensagens_ok": len(turnos),
+        "vazao_msgs_por_s": round(len(turnos) / duracao, 2) if duracao else None,
+        "latencia_total_ms": resumo_latencias([t["total_ms"] for t in turnos]),
+        "latencia_primeiro_byte_ms": resumo_latencias([t["primeiro_byte_ms"] for t in turnos]),
+        "taxa_erro": round(sum(erros.values()) / tentativas, 4) if tentativas else None,
+        "erros": erros,
+        "origens": origens,
+        "rss_servidor_kb": rss,
+    }
+
+
+def executar_carga(args):
+    """Roda --clientes alunos simultâneos com perguntas aleatórias."""
+    with servidor(args) as (url, rss):
+        clientes = [
+            ClienteSimulado(url, roteiro_aleatorio(args.turnos, args.repetidas), args.timeout,
+                            args.transportes, i * args.rampa / args.clientes)
+            for i in range(args.clientes)
+        ]
+        threads = [threading.Thread(target=c.executar) for c in clientes]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+
+    parametros = {"clientes": args.clientes, "turnos": args.turnos, "repetidas": args.repetidas}
+    return montar_relatorio(args, clientes, duracao, rss, parametros)
+
+
+def comparar(caminho_antes, caminho_depois):
+    with open(caminho_antes, encoding="utf-8") as f:
+        antes = json.load(f)
+    with open(caminho_depois, encoding="utf-8") as f:
+        depois = json.load(f)
+
+    def linha(nome, a, d):
+        if isinstance(a, (int, float)) and isinstance(d, (int, float)) and a:
+            variacao = f"{(d - a) / a * 100:+.1f}%"
+        else:
+            variacao = ""
+        print(f"{nome:<28} {str(a):>12} {str(d):>12} {variacao:>9}")
+
+    print(f"{'métrica':<28} {'antes':>12} {'depois':>12}")
+    linha("vazao_msgs_por_s", antes["vazao_msgs_por_s"], depois["vazao_msgs_por_s"])
+    linha("taxa_erro", antes["taxa_erro"], depois["taxa_erro"])
+    for grupo in ("latencia_total_ms", "latencia_primeiro_byte_ms"):
+        for p in ("p50", "p95", "p99"):
+            linha(f"{grupo}.{p}", antes[grupo][p], depois[grupo][p])
+    linha("rss_servidor_kb.pico", antes["rss_servidor_kb"]["pico"], depois["rss_servidor_kb"]["pico"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do OrtoFix com Gemini simulado.")
+    parser.add_argument("--clientes", type=int, default=20, help="Clientes simultâneos.")
+    parser.add_argument("--turnos", type=int, default=5, help="Mensagens por cliente.")
+    parser.add_argument("--repetidas", type=float, default=0.5,
+                        help="Fração de perguntas repetidas (o resto ganha um sufixo único).")
+    parser.add_argument("--rampa", type=float, default=1.0,
+                        help="Segundos para conectar todos os clientes.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Espera máxima por resposta.")
+    parser.add_argument("--porta", type=int, default=5055)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--sem-servidor", action="store_true",
+                        help="Não sobe o servidor falso; usa o servidor em --url.")
+    parser.add_argument("--transportes", nargs="+", default=["websocket"],
+                        choices=["websocket", "polling"])
+    parser.add_argument("--saida", help="Arquivo JSON do resultado "
+                        "(padrão: benchmark/resultados/carga-<data>.json).")
+    parser.add_argument("--verboso", action="store_true", help="Mostra a saída do servidor.")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"),
+                        help="Compara dois resultados em vez de rodar o teste.")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    resultado = executar_carga(args)
+    saida = args.saida or os.path.join(
+        RAIZ, "benchmark", "resultados", f"carga-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    print(f"Resultado salvo em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Reproduz um log de conversas (logs/conversas*.jsonl[.gz]) contra o OrtoFix
+com Gemini simulado, para medir o servidor com um padrão de tráfego real.
+
+O log é lido em streaming, na ordem do tempo: cada mensagem é enviada no
+mesmo instante relativo em que foi enviada originalmente (--velocidade
+comprime o tempo, 10 = dez vezes mais rápido). Cada session_id vira um
+cliente python-socketio, criado só quando a primeira mensagem da sessão
+chega e desconectado depois de --ocioso segundos sem mensagens; no máximo
+--max-clientes ficam conectados ao mesmo tempo. Se o servidor atrasar, as
+mensagens seguintes da sessão esperam a resposta anterior, como o aluno
+esperaria. --max-pausa corta períodos longos sem nenhuma mensagem.
+
+Exemplos:
+    python -m benchmark.replay logs/conversas.jsonl
+    python -m benchmark.replay logs/conversas-20261017-*.jsonl.gz --velocidade 20
+    python -m benchmark.replay logs/conversas.jsonl --url http://127.0.0.1:5000 --sem-servidor
+
+O relatório tem o mesmo formato do load_test, então dá para usar
+    python -m benchmark.load_test --comparar antes.json depois.json
+"""
+import argparse
+import heapq
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from itertools import count
+
+from benchmark.load_test import RAIZ, ClienteSimulado, montar_relatorio, servidor
+from conversation_log import ler_log
+
+
+def eventos_em_ordem(caminhos, janela=120.0, limite=None):
+    """
+    Gera (instante_envio, session_id, mensagem) em ordem de envio, lendo os
+    logs em streaming. O log é gravado no fim de cada resposta, então o
+    envio (fim menos a latência) sai levemente fora de ordem; um heap com
+    `janela` segundos de log reordena isso sem carregar o arquivo inteiro.
+    """
+    pendentes = []
+    sequencia = count()
+    mais_recente = None
+    total = 0
+    for caminho in caminhos:
+        for registro in ler_log(caminho):
+            if not registro.get("mensagem") or not registro.get("ts"):
+                continue
+            fim = datetime.fromisoformat(registro["ts"]).timestamp()
+            envio = fim - (registro.get("latencia_ms") or 0) / 1000
+            numero = next(sequencia)
+            # Sem session_id não dá para saber a que conversa a mensagem pertence
+            sessao = registro.get("session_id") or f"avulsa-{numero}"
+            heapq.heappush(pendentes, (envio, numero, sessao, registro["mensagem"]))
+            mais_recente = fim if mais_recente is None else max(mais_recente, fim)
+            while pendentes and pendentes[0][0] < mais_recente - janela:
+                envio, _, sessao, mensagem = heapq.heappop(pendentes)
+                yield envio, sessao, mensagem
+                total += 1
+                if limite and total >= limite:
+                    return
+    while pendentes:
+        envio, _, sessao, mensagem = heapq.heappop(pendentes)
+        yield envio, sessao, mensagem
+        total += 1
+        if limite and total >= limite:
+            return
+
+
+class ClienteReplay(ClienteSimulado):
+    """
+    Cliente de uma sessão do log: conecta na primeira mensagem, envia as que
+    forem chegando pela fila e desconecta depois de `ocioso` segundos parado.
+    """
+    def __init__(self, url, timeout, transportes, ocioso):
+        super().__init__(url, [], timeout, transportes)
+        self.ocioso = ocioso
+        self._fila = queue.Queue()
+        self._lock_fila = threading.Lock()
+        self.encerrado = False
+
+    def entregar(self, mensagem):
+        """Enfileira a mensagem; False se o cliente já encerrou (é preciso outro)."""
+        with self._lock_fila:
+            if self.encerrado:
+                return False
+            self._fila.put(mensagem)
+            return True
+
+    def encerrar(self):
+        with self._lock_fila:
+            if not self.encerrado:
+                self._fila.put(None)
+
+    def _proxima(self):
+        try:
+            return self._fila.get(timeout=self.ocioso)
+        except queue.Empty:
+            with self._lock_fila:
+                # Confere de novo sob o lock: o agendador pode ter entregado agora
+                if self._fila.empty():
+                    self.encerrado = True
+                    return None
+            return self._fila.get_nowait()
+
+    def executar(self):
+        if not self.conectar():
+            with self._lock_fila:
+                self.encerrado = True
+                perdidas = self._fila.qsize()
+            for _ in range(perdidas):
+                self._registrar_erro("conexao: mensagem_perdida")
+            return
+        try:
+            while True:
+                mensagem = self._proxima()
+                if mensagem is None:
+                    break
+                self.enviar(mensagem)
+        finally:
+            with self._lock_fila:
+                self.encerrado = True
+            self._sio.disconnect()
+
+
+class Resultados:
+    """Soma as medições dos clientes que já terminaram (no formato de ClienteSimulado)."""
+    def __init__(self):
+        self.turnos_medidos = []
+        self.erros = {}
+        self.conexoes = 0
+        self._lock = threading.Lock()
+
+    def somar(self, cliente):
+        with self._lock:
+            self.conexoes += 1
+            self.turnos_medidos.extend(cliente.turnos_medidos)
+            for tipo, quantidade in cliente.erros.items():
+                self.erros[tipo] = self.erros.get(tipo, 0) + quantidade
+
+
+def reproduzir(args, url):
+    """
+    Agenda as mensagens do log no tempo e devolve (resultados, duração,
+    atraso máximo do agendamento em segundos).
+    """
+    vagas = threading.BoundedSemaphore(args.max_clientes)
+    ativos = {}
+    resultados = Resultados()
+    atraso_maximo = 0.0
+    inicio = time.perf_counter()
+    deslocamento = None
+    envio_anterior = None
+
+    def rodar(cliente):
+        try:
+            cliente.executar()
+        finally:
+            resultados.somar(cliente)
+            vagas.release()
+
+    for envio, sessao, mensagem in eventos_em_ordem(args.logs, limite=args.limite):
+        if deslocamento is None:
+            deslocamento = envio
+        elif args.max_pausa is not None:
+            # Corta períodos sem nenhuma mensagem
+            excesso = (envio - envio_anterior) / args.velocidade - args.max_pausa
+            if excesso > 0:
+                deslocamento += excesso * args.velocidade
+        envio_anterior = envio
+
+        alvo = inicio + (envio - deslocamento) / args.velocidade
+        espera = alvo - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        atraso_maximo = max(atraso_maximo, -espera)
+
+        cliente = ativos.get(sessao)
+        if cliente is None or not cliente.entregar(mensagem):
+            vagas.acquire()
+            cliente = ClienteReplay(url, args.timeout, args.transportes, args.ocioso)
+            cliente.entregar(mensagem)
+            ativos[sessao] = cliente
+            threading.Thread(target=rodar, args=(cliente,), daemon=True).start()
+            # Esquece as sessões que já encerraram, para o dict não crescer com o log
+            if len(ativos) > 2 * args.max_clientes:
+                ativos = {s: c for s, c in ativos.items() if not c.encerrado}
+
+    for cliente in ativos.values():
+        cliente.encerrar()
+    # Quando todas as vagas voltam, todos os clientes terminaram
+    for _ in range(args.max_clientes):
+        vagas.acquire()
+    return resultados, time.perf_counter() - inicio, atraso_maximo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduz um log de conversas com Gemini simulado.")
+    parser.add_argument("logs", nargs="+", help="Arquivos .jsonl ou .jsonl.gz, na ordem do tempo.")
+    parser.add_argument("--velocidade", type=float, default=1.0,
+                        help="Fator de aceleração do tempo (2 = duas vezes mais rápido).")
+    parser.add_argument("--max-pausa", type=float, default=None,
+                        help="Limite, em segundos já acelerados, para períodos sem mensagens.")
+    parser.add_argument("--limite", type=int, default=None, help="Reproduz só as N primeiras mensagens.")
+    parser.add_argument("--max-clientes", type=int, default=200,
+                        help="Clientes conectados ao mesmo tempo, no máximo.")
+    parser.add_argument("--ocioso", type=float, default=30.0,
+                        help="Segundos sem mensagens até um cliente desconectar.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Espera máxima por resposta.")
+    parser.add_argument("--porta", type=int, default=5055)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--sem-servidor", action="store_true",
+                        help="Não sobe o servidor falso; usa o servidor em --url.")
+    parser.add_argument("--transportes", nargs="+", default=["websocket"],
+                        choices=["websocket", "polling"])
+    parser.add_argument("--saida", help="Arquivo JSON do resultado "
+                        "(padrão: benchmark/resultados/replay-<data>.json).")
+    parser.add_argument("--verboso", action="store_true", help="Mostra a saída do servidor.")
+    args = parser.parse_args()
+    if args.velocidade <= 0:
+        parser.error("--velocidade precisa ser maior que zero.")
+    if args.max_clientes < 1:
+        parser.error("--max-clientes precisa ser pelo menos 1.")
+
+    with servidor(args) as (url, rss):
+        resultados, duracao, atraso_maximo = reproduzir(args, url)
+    if not resultados.conexoes:
+        parser.error("Nenhuma mensagem encontrada nos logs.")
+
+    parametros = {
+        "logs": args.logs,
+        "conexoes": resultados.conexoes,
+        "velocidade": args.velocidade,
+        "max_pausa": args.max_pausa,
+        "max_clientes": args.max_clientes,
+        "atraso_maximo_agendamento_s": round(atraso_maximo, 3),
+    }
+    resultado = montar_relatorio(args, [resultados], duracao, rss, parametros)
+    saida = args.saida or os.path.join(
+        RAIZ, "benchmark", "resultados", f"replay-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    print(f"Resultado salvo em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Sobe o app.py com o Gemini trocado pelo client falso de benchmark/fake_genai.py.
+
+Uso:
+    python -m benchmark.servidor_fake --porta 5055
+
+As chaves de API viram chaves falsas (a não ser que GEMINI_API_KEYS já
+esteja definida) e o limite por chave fica alto, para o teste medir o
+servidor e não o orçamento das chaves. O log de conversas vai para
+benchmark/resultados/. Tudo pode ser sobrescrito por variáveis de ambiente.
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import os
+import sys
+
+from google import genai
+
+from benchmark.fake_genai import FakeClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor OrtoFix com Gemini simulado.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=5055)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEYS", "['fake-0', 'fake-1', 'fake-2']")
+    os.environ.setdefault("GEMINI_RPM_POR_CHAVE", "100000")
+    # O tráfego simulado não se mistura ao log de conversas de verdade
+    os.environ.setdefault("ORTOFIX_LOG_CONVERSAS", "benchmark/resultados/conversas-fake.jsonl")
+    genai.Client = FakeClient
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as ortofix
+
+    ortofix.socketio.run(ortofix.app, host=args.host, port=args.porta, log_output=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+logger = logging.getLogger("ortofix.conversas")
+
+
+def _executar_direto(fn, *args):
+    return fn(*args)
+
+
+class ConversationLog:
+    """
+    Log de auditoria das conversas em JSONL (um registro por mensagem).
+
+    log() só coloca o registro numa fila em memória e nunca bloqueia o
+    handler. Uma thread em segundo plano grava em lotes (`batch_size`
+    registros ou a cada `flush_interval` segundos) e gira o arquivo quando
+    ele passa de `max_bytes` ou quando o dia muda, compactando o antigo com
+    gzip se `compress` estiver ativo.
+
+    Vários processos (workers) podem usar o mesmo `path`: cada lote é gravado
+    sob um flock exclusivo e, antes de gravar, o arquivo é reaberto se outro
+    processo o girou.
+
+    Sob pressão: com a fila acima de `high_water` (fração de `max_queue`),
+    só 1 em cada `sample_every` registros é aceito; com a fila cheia, o
+    registro é descartado. Os dois casos são contados em stats().
+    """
+    def __init__(self, path, max_queue=10000, batch_size=200, flush_interval=1.0,
+                 max_bytes=50 * 1024 * 1024, rotate_daily=True, compress=True,
+                 high_water=0.8, sample_every=10, executor=None):
+        """
+        Args:
+            path (str): Arquivo JSONL atual (os girados ficam na mesma pasta).
+            max_queue (int): Registros que podem esperar na fila.
+            batch_size (int): Registros gravados por lote.
+            flush_interval (float): Segundos máximos até um registro ir para o disco.
+            max_bytes (int): Tamanho que faz o arquivo girar (0 desativa).
+            rotate_daily (bool): Gira o arquivo quando o dia (UTC) muda.
+            compress (bool): Compacta os arquivos girados com gzip.
+            high_water (float): Fração da fila a partir da qual entra a amostragem.
+            sample_every (int): Sob pressão, aceita 1 a cada `sample_every` registros.
+            executor (callable): Roda a escrita/compactação fora do loop
+                (ex.: eventlet.tpool.execute); por padrão chama direto.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self.max_queue = max_queue
+        self._limite_amostragem = int(max_queue * high_water)
+        self.sample_every = max(1, sample_every)
+        self._executor = executor or _executar_direto
+        self._fila = queue.Queue(maxsize=max_queue)
+        self._parar = threading.Event()
+        self._arquivo = None
+        self._arquivo_trava = None
+        self._contador_amostragem = 0
+        self.escritos = 0
+        self.descartados = 0
+        self.fora_da_amostra = 0
+        self.rotacoes = 0
+        pasta = os.path.dirname(os.path.abspath(path))
+        os.makedirs(pasta, exist_ok=True)
+        self._thread = threading.Thread(target=self._loop, name="conversation-log", daemon=True)
+        self._thread.start()
+
+    def log(self, registro):
+        """
+        Enfileira um registro (dict). Retorna False se ele foi descartado ou
+        ficou fora da amostra.
+        """
+        if self._fila.qsize() >= self._limite_amostragem:
+            self._contador_amostragem += 1
+            if self._contador_amostragem % self.sample_every:
+                self.fora_da_amostra += 1
+                return False
+        try:
+            self._fila.put_nowait(registro)
+            return True
+        except queue.Full:
+            self.descartados += 1
+            return False
+
+    def _loop(self):
+        while not (self._parar.is_set() and self._fila.empty()):
+            try:
+                lote = [self._fila.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(lote) < self.batch_size:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            linhas = "".join(
+                json.dumps(registro, ensure_ascii=False, default=str) + "\n" for registro in lote
+            )
+            try:
+                self._executor(self._gravar, linhas)
+                self.escritos += len(lote)
+            except Exception as e:
+                self.descartados += len(lote)
+                logger.error("erro_gravando_log registros=%d erro=%s", len(lote), e)
+        self._fechar_tudo()
+
+    @contextmanager
+    def _trava(self):
+        """
+        Lock exclusivo entre processos (flock num arquivo .lock ao lado do log):
+        vários workers gravam no mesmo arquivo e qualquer um deles pode girá-lo.
+        """
+        if fcntl is None:
+            yield
+            return
+        if self._arquivo_trava is None:
+            self._arquivo_trava = open(self.path + ".lock", "a")
+        fcntl.flock(self._arquivo_trava.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._arquivo_trava.fileno(), fcntl.LOCK_UN)
+
+    def _abrir_atual(self):
+        """Garante que o arquivo aberto é o que está em `path` agora (outro worker pode ter girado)."""
+        if self._arquivo is not None:
+            try:
+                no_caminho = os.stat(self.path)
+                aberto = os.fstat(self._arquivo.fileno())
+                if (no_caminho.st_ino, no_caminho.st_dev) == (aberto.st_ino, aberto.st_dev):
+                    return
+            except FileNotFoundError:
+                pass
+            self._fechar_arquivo()
+        self._arquivo = open(self.path, "ab")
+
+    def _gravar(self, linhas):
+        dados = linhas.encode("utf-8")
+        girado = None
+        with self._trava():
+            self._abrir_atual()
+            estado = os.fstat(self._arquivo.fileno())
+            # Critérios tirados do próprio arquivo, para todos os workers decidirem igual
+            dia_arquivo = datetime.fromtimestamp(estado.st_mtime, timezone.utc).date()
+            if estado.st_size and (
+                    (self.rotate_daily and dia_arquivo != datetime.now(timezone.utc).date())
+                    or (self.max_bytes and estado.st_size + len(dados) > self.max_bytes)):
+                girado = self._girar()
+                self._abrir_atual()
+            self._arquivo.write(dados)
+            self._arquivo.flush()
+        if girado and self.compress:
+            # Fora do lock: ninguém mais grava no arquivo girado
+            self._compactar(girado)
+
+    def _girar(self):
+        self._fechar_arquivo()
+        base, extensao = os.path.splitext(self.path)
+        destino = f"{base}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}{extensao}"
+        sufixo = 1
+        while os.path.exists(destino) or os.path.exists(destino + ".gz"):
+            destino = f"{base}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{sufixo}{extensao}"
+            sufixo += 1
+        os.replace(self.path, destino)
+        self.rotacoes += 1
+        return destino
+
+    def _compactar(self, caminho):
+        with open(caminho, "rb") as origem, gzip.open(caminho + ".gz", "wb") as compactado:
+            shutil.copyfileobj(origem, compactado)
+        os.remove(caminho)
+
+    def _fechar_arquivo(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def _fechar_tudo(self):
+        self._fechar_arquivo()
+        if self._arquivo_trava is not None:
+            self._arquivo_trava.close()
+            self._arquivo_trava = None
+
+    def close(self, timeout=5):
+        """Grava o que está na fila e encerra a thread de escrita."""
+        self._parar.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "na_fila": self._fila.qsize(),
+            "escritos": self.escritos,
+            "descartados": self.descartados,
+            "fora_da_amostra": self.fora_da_amostra,
+            "rotacoes": self.rotacoes,
+        }
+
+
+def agora_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+def ler_log(caminho):
+    """Lê um log de conversas (.jsonl ou .jsonl.gz) registro a registro."""
+    abrir = gzip.open if caminho.endswith(".gz") else open
+    with abrir(caminho, "rt", encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.strip()
+            if linha:
+                yield json.loads(linha)
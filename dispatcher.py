@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class FilaCheiaError(Exception):
+    """
+    Levantada quando a fila de espera do despachante já está no limite.
+    """
+
+
+class UpstreamDispatcher:
+    """
+    Controla quantas chamadas ao Gemini rodam ao mesmo tempo.
+
+    - No máximo `max_concurrent` chamadas executam em paralelo no processo.
+    - As mensagens de uma mesma sessão rodam uma de cada vez, na ordem em que
+      chegaram (fila FIFO por sessão, ver turno()), para não misturar turnos
+      no mesmo chat.
+    - No máximo `max_waiting` chamadas podem ficar esperando; acima disso
+      turno() e executar() levantam FilaCheiaError em vez de acumular trabalho.
+
+    Com o eventlet.monkey_patch() os primitivos de threading viram primitivos
+    de greenlet, então quem espera aqui só bloqueia o próprio handler.
+    """
+    def __init__(self, max_concurrent=8, max_waiting=32, on_wait=None):
+        """
+        Args:
+            max_concurrent (int): Chamadas simultâneas permitidas.
+            max_waiting (int): Tamanho máximo da fila de espera.
+            on_wait (callable): Recebe quantos segundos cada chamada esperou na fila.
+        """
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent deve ser pelo menos 1.")
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self._cond = threading.Condition()
+        self._ativos = 0
+        self._aguardando = 0
+        self._filas = {}
+        self._on_wait = on_wait
+
+    def executar(self, fn, *args, **kwargs):
+        """
+        Espera só uma vaga global e executa fn(*args, **kwargs). Para quem já
+        está dentro de turno() da sessão e precisa chamar o Gemini.
+
+        Raises:
+            FilaCheiaError: Se a fila de espera estiver cheia.
+        """
+        with self._vaga(time.perf_counter()):
+            return fn(*args, **kwargs)
+
+    @contextmanager
+    def turno(self, session_id):
+        """
+        Reserva a vez da sessão: o bloco só roda depois das mensagens anteriores
+        da mesma sessão e conta em pending() até terminar. Não ocupa vaga global,
+        então respostas que não chamam o Gemini (locais, cache) não disputam
+        as vagas de quem chama.
+
+        Raises:
+            FilaCheiaError: Se for preciso esperar e a fila de espera estiver cheia.
+        """
+        ticket = object()
+        with self._cond:
+            fila = self._filas.setdefault(session_id, deque())
+            if fila and self._aguardando >= self.max_waiting:
+                self._descartar_fila_vazia(session_id, fila)
+                raise FilaCheiaError(
+                    f"Fila de espera cheia ({self._aguardando}/{self.max_waiting})."
+                )
+            fila.append(ticket)
+            if fila[0] is not ticket:
+                self._aguardando += 1
+                try:
+                    while fila[0] is not ticket:
+                        self._cond.wait()
+                except BaseException:
+                    # O greenlet foi interrompido enquanto esperava: libera o lugar na fila
+                    self._aguardando -= 1
+                    fila.remove(ticket)
+                    self._descartar_fila_vazia(session_id, fila)
+                    self._cond.notify_all()
+                    raise
+                self._aguardando -= 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                fila.popleft()
+                self._descartar_fila_vazia(session_id, fila)
+                self._cond.notify_all()
+
+    @contextmanager
+    def _vaga(self, chegada):
+        with self._cond:
+            if self._ativos >= self.max_concurrent:
+                if self._aguardando >= self.max_waiting:
+                    raise FilaCheiaError(
+                        f"Fila de espera cheia ({self._aguardando}/{self.max_waiting})."
+                    )
+                self._aguardando += 1
+                try:
+                    while self._ativos >= self.max_concurrent:
+                        self._cond.wait()
+                finally:
+                    self._aguardando -= 1
+            self._ativos += 1
+
+        if self._on_wait is not None:
+            self._on_wait(time.perf_counter() - chegada)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._ativos -= 1
+                self._cond.notify_all()
+
+    def _descartar_fila_vazia(self, session_id, fila):
+        if not fila and self._filas.get(session_id) is fila:
+            del self._filas[session_id]
+
+    def pending(self, session_id):
+        """
+        Quantas mensagens da sessão estão esperando ou rodando agora (incluindo
+        as que estão dentro de turno()).
+        """
+        with self._cond:
+            return len(self._filas.get(session_id, ()))
+
+    def stats(self):
+        """
+        Retorna um retrato do estado atual do despachante.
+        """
+        with self._cond:
+            return {
+                "ativos": self._ativos,
+                "aguardando": self._aguardando,
+                "sessoes_na_fila": len(self._filas),
+                "max_concurrent": self.max_concurrent,
+                "max_waiting": self.max_waiting,
+            }
@@ -1,24 +1,113 @@
 import os
 import ast
+import logging
+import re
+import threading
+import time
 from dotenv import load_dotenv
 
+logger = logging.getLogger("ortofix.chaves")
+
+
+class QuotaExcedidaError(Exception):
+    """
+    Levantada quando nenhuma chave consegue atender o pedido (todas em
+    cooldown ou sem orçamento de requisições) dentro do tempo de espera.
+    """
+
+
+def is_rate_limit_error(erro):
+    """
+    Diz se a exceção é um erro de quota/limite (HTTP 429 / RESOURCE_EXHAUSTED).
+    """
+    if getattr(erro, "code", None) == 429:
+        return True
+    texto = str(erro)
+    return "429" in texto or "RESOURCE_EXHAUSTED" in texto or "quota" in texto.lower()
+
+
+_RETRY_DELAY = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s")
+_RETRY_IN = re.compile(r"retry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+
+def retry_hint_seconds(erro):
+    """
+    Extrai o tempo de espera sugerido pela API em um erro 429
+    (campo retryDelay do RetryInfo ou "Please retry in 12.3s"), se houver.
+    """
+    texto = str(getattr(erro, "details", "") or "") + " " + str(erro)
+    for padrao in (_RETRY_DELAY, _RETRY_IN):
+        encontrado = padrao.search(texto)
+        if encontrado:
+            return float(encontrado.group(1))
+    return None
+
+
+def _criar_client_genai(chave):
+    from google import genai
+    return genai.Client(api_key=chave)
+
+
+class _EstadoChave:
+    """Uso e orçamento de uma chave de API."""
+    def __init__(self, indice, chave, rpm, agora):
+        self.indice = indice
+        self.chave = chave
+        self.client = None
+        self.capacidade = float(rpm)
+        self.tokens = float(rpm)
+        self.reabastecido_em = agora
+        self.em_uso = 0
+        self.cooldown_ate = 0.0
+        self.requisicoes = 0
+        self.erros_429 = 0
+        self.trocas = 0
+
+
 class KeyManager:
     """
-    Gerencia um pool de chaves de API, permitindo a troca para a próxima
-    chave disponível em caso de falha ou uso excessivo.
+    Gerencia um pool de chaves de API e escolhe qual chave atende cada pedido.
+
+    - Cada chave tem um balde de tokens com `rpm` requisições por minuto.
+    - Depois de um 429 a chave fica em cooldown pelo tempo sugerido pela API
+      (ou `default_cooldown` segundos).
+    - Cada pedido vai para a chave disponível com menos requisições em andamento.
+    - Cada chave mantém o próprio client, reaproveitando o pool de conexões.
+    - call() repete automaticamente quando recebe um 429 (em outra chave, ou na
+      mesma depois do cooldown) até `max_wait` segundos, então o aluno não vê o
+      erro de quota enquanto alguma chave puder atender nesse prazo.
     """
-    def __init__(self, key_env_var="GEMINI_API_KEYS"):
+    def __init__(self, key_env_var="GEMINI_API_KEYS", rpm=15, default_cooldown=60,
+                 max_wait=10, client_factory=None, keys=None, clock=time.monotonic,
+                 sleep=time.sleep):
         """
         Inicializa o gerenciador de chaves.
 
         Args:
             key_env_var (str): Nome da variável de ambiente que contém a lista de chaves.
+            rpm (float): Requisições por minuto permitidas em cada chave.
+            default_cooldown (float): Cooldown após 429 quando a API não sugere um tempo.
+            max_wait (float): Tempo máximo esperando uma chave ficar disponível.
+            client_factory (callable): Cria o client de uma chave (padrão: genai.Client).
+            keys (list): Lista de chaves; se omitida, é lida de `key_env_var`.
+            clock (callable): Relógio em segundos (injetável para testes).
+            sleep (callable): Função de espera (injetável para testes).
         """
         load_dotenv()
-        self.keys = self._load_keys(key_env_var)
+        self.keys = list(keys) if keys is not None else self._load_keys(key_env_var)
         self.current_key_index = 0
         if not self.keys:
             raise ValueError("Nenhuma chave de API encontrada na variável de ambiente.")
+        self.rpm = rpm
+        self.default_cooldown = default_cooldown
+        self.max_wait = max_wait
+        self._client_factory = client_factory or _criar_client_genai
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        agora = clock()
+        self._estados = [_EstadoChave(i, chave, rpm, agora) for i, chave in enumerate(self.keys)]
+        self.trocas = 0
 
     def _load_keys(self, key_env_var):
         """
@@ -30,26 +119,30 @@ class KeyManager:
                 # Usa ast.literal_eval para converter a string em uma lista Python
                 return ast.literal_eval(keys_str)
             except (ValueError, SyntaxError) as e:
-                print(f"Erro ao ler as chaves do .env: {e}")
+                logger.error("erro_lendo_chaves variavel=%s erro=%s", key_env_var, e)
                 return []
         return []
 
     def get_current_key(self):
         """
-        Retorna a chave de API atualmente ativa.
+        Retorna a chave de API usada no pedido mais recente.
         """
         return self.keys[self.current_key_index]
 
     def switch_key(self):
         """
-        Troca para a próxima chave de API na lista.
-        Se chegar ao final, volta para a primeira chave.
+        Coloca a chave atual em cooldown, fazendo os próximos pedidos irem para outras chaves.
         """
         if len(self.keys) > 1:
-            self.current_key_index = (self.current_key_index + 1) % len(self.keys)
-            print(f"Chave de API trocada. Usando a chave no índice: {self.current_key_index}")
+            with self._lock:
+                estado = self._estados[self.current_key_index]
+                estado.cooldown_ate = self._clock() + self.default_cooldown
+                estado.trocas += 1
+                self.current_key_index = (self.current_key_index + 1) % len(self.keys)
+                self.trocas += 1
+            logger.info("chave_trocada indice=%d", self.current_key_index)
         else:
-            print("Apenas uma chave disponível. A troca não é necessária.")
+            logger.info("troca_ignorada motivo=chave_unica")
 
     def get_all_keys(self):
         """
@@ -57,6 +150,153 @@ class KeyManager:
         """
         return self.keys
 
+    def get_client(self, indice):
+        """
+        Retorna o client da chave `indice`, criando-o na primeira vez.
+        """
+        estado = self._estados[indice]
+        if estado.client is None:
+            with self._lock:
+                if estado.client is None:
+                    estado.client = self._client_factory(estado.chave)
+        return estado.client
+
+    def _reabastecer(self, estado, agora):
+        decorrido = agora - estado.reabastecido_em
+        if decorrido > 0:
+            estado.tokens = min(estado.capacidade, estado.tokens + decorrido * estado.capacidade / 60.0)
+            estado.reabastecido_em = agora
+
+    def _tempo_ate_disponivel(self, estado, agora):
+        espera = max(0.0, estado.cooldown_ate - agora)
+        if estado.tokens < 1:
+            espera = max(espera, (1 - estado.tokens) * 60.0 / estado.capacidade)
+        return espera
+
+    def acquire(self, excluir=(), limite=None):
+        """
+        Reserva a chave disponível menos ocupada e retorna seu índice.
+        Espera até `max_wait` segundos (ou até o instante `limite`, no relógio
+        do gerenciador) se todas estiverem sem orçamento ou em cooldown.
+
+        Raises:
+            QuotaExcedidaError: Se nenhuma chave ficar disponível a tempo.
+        """
+        if limite is None:
+            limite = self._clock() + self.max_wait
+        while True:
+            with self._lock:
+                agora = self._clock()
+                candidatos = [e for e in self._estados if e.indice not in excluir]
+                if not candidatos:
+                    candidatos = self._estados
+                for estado in candidatos:
+                    self._reabastecer(estado, agora)
+                livres = [e for e in candidatos if self._tempo_ate_disponivel(e, agora) == 0]
+                if livres:
+                    escolhido = min(livres, key=lambda e: (e.em_uso, -e.tokens, e.indice))
+                    escolhido.tokens -= 1
+                    escolhido.em_uso += 1
+                    escolhido.requisicoes += 1
+                    self.current_key_index = escolhido.indice
+                    return escolhido.indice
+                espera = min(self._tempo_ate_disponivel(e, agora) for e in candidatos)
+
+            if agora + espera > limite:
+                raise QuotaExcedidaError(
+                    f"Nenhuma chave disponível nos próximos {max(0.0, limite - agora):.0f}s "
+                    f"(próxima em {espera:.1f}s)."
+                )
+            self._sleep(espera)
+
+    def release(self, indice):
+        """
+        Libera a reserva feita por acquire().
+        """
+        with self._lock:
+            self._estados[indice].em_uso -= 1
+
+    def report_rate_limit(self, indice, erro=None):
+        """
+        Coloca a chave em cooldown depois de um 429 e retorna a duração em segundos.
+        """
+        cooldown = retry_hint_seconds(erro) if erro is not None else None
+        if cooldown is None:
+            cooldown = self.default_cooldown
+        with self._lock:
+            estado = self._estados[indice]
+            estado.erros_429 += 1
+            estado.tokens = min(estado.tokens, 0.0)
+            estado.cooldown_ate = max(estado.cooldown_ate, self._clock() + cooldown)
+        logger.warning("rate_limit indice=%d cooldown_s=%.1f", indice, cooldown)
+        return cooldown
+
+    def call(self, fn, max_attempts=None):
+        """
+        Executa fn(client, indice) com a melhor chave disponível. Se a chamada
+        receber um 429, a chave entra em cooldown pelo tempo sugerido pela API
+        e fn é repetida na próxima chave que ficar livre (que pode ser a mesma,
+        depois do cooldown), até `max_wait` segundos depois do início.
+
+        Args:
+            fn (callable): Recebe o client e o índice da chave.
+            max_attempts (int): Limite opcional de tentativas (padrão: só o tempo limita).
+
+        Raises:
+            QuotaExcedidaError: Se nenhuma chave conseguir atender a tempo.
+        """
+        limite = self._clock() + self.max_wait
+        tentativas = 0
+        ultimo_erro = None
+        while True:
+            try:
+                indice = self.acquire(limite=limite)
+            except QuotaExcedidaError as e:
+                if ultimo_erro is None:
+                    raise
+                raise QuotaExcedidaError(
+                    f"Todas as chaves continuam no limite depois de {tentativas} tentativas ({e})"
+                ) from ultimo_erro
+            tentativas += 1
+            try:
+                return fn(self.get_client(indice), indice)
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                ultimo_erro = e
+                self.report_rate_limit(indice, e)
+                if max_attempts and tentativas >= max_attempts:
+                    raise QuotaExcedidaError(
+                        f"Todas as tentativas receberam 429 ({tentativas} tentativas)."
+                    ) from e
+                # O pedido vai ser repetido (em outra chave, ou nesta depois do cooldown)
+                with self._lock:
+                    self._estados[indice].trocas += 1
+                    self.trocas += 1
+            finally:
+                self.release(indice)
+
+    def stats(self):
+        """
+        Retorna o uso e o cooldown de cada chave (as chaves aparecem mascaradas).
+        """
+        with self._lock:
+            agora = self._clock()
+            chaves = []
+            for estado in self._estados:
+                self._reabastecer(estado, agora)
+                chaves.append({
+                    "indice": estado.indice,
+                    "chave": "..." + str(estado.chave)[-4:],
+                    "tokens": round(estado.tokens, 2),
+                    "em_uso": estado.em_uso,
+                    "requisicoes": estado.requisicoes,
+                    "erros_429": estado.erros_429,
+                    "trocas": estado.trocas,
+                    "cooldown_restante": round(max(0.0, estado.cooldown_ate - agora), 1),
+                })
+            return {"rpm_por_chave": self.rpm, "trocas": self.trocas, "chaves": chaves}
+
 # --- Exemplo de Uso ---
 # Este bloco de código demonstra como usar a classe KeyManager no seu projeto.
 
@@ -64,23 +304,17 @@ if __name__ == "__main__":
     # 1. Crie uma instância do gerenciador de chaves.
     key_manager = KeyManager()
 
-    # 2. Obtenha a chave atual.
-    current_key = key_manager.get_current_key()
-    print(f"Chave inicial: {current_key}")
-
-    # 3. Simule o uso da API e uma falha que exige a troca.
-    # No seu código real, você faria uma chamada à API do Gemini aqui
-    # e, se a chamada falhar (por exemplo, devido a um erro 429 - Too Many Requests),
-    # você chamaria o método switch_key().
-    print("Simulando falha de chave...")
-    key_manager.switch_key()
-
-    # 4. Obtenha a nova chave para continuar as operações.
-    new_key = key_manager.get_current_key()
-    print(f"Nova chave após a troca: {new_key}")
-
-    # Você pode continuar a trocar as chaves conforme necessário.
-    print("Simulando nova falha...")
-    key_manager.switch_key()
-    next_key = key_manager.get_current_key()
-    print(f"Próxima chave: {next_key}")
\ No newline at end of file
+    # 2. Use call() para cada pedido ao Gemini. A função recebe o client da
+    # chave escolhida; se ela devolver 429, o pedido é repetido em outra chave.
+    def perguntar(client, indice):
+        print(f"Usando a chave no índice: {indice}")
+        resposta = client.models.generate_content(
+            model="gemini-2.0-flash",
+            contents="Como se escreve: exceção ou excessão?"
+        )
+        return resposta.text
+
+    print(key_manager.call(perguntar))
+
+    # 3. Veja o uso e o cooldown de cada chave.
+    print(key_manager.stats())
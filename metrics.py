@@ -0,0 +1,170 @@
+import bisect
+import threading
+
+# Limites (em segundos) dos histogramas de latência: de 5 ms a 1 min
+LATENCIA_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_labels(nomes, valores, extra=None):
+    pares = list(zip(nomes, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + "}"
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda, labels=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _chave(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.nome} espera os labels {self.labels}, recebeu {labels}")
+        return tuple(str(v) for v in labels)
+
+    def cabecalho(self):
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+
+class Counter(_Metrica):
+    """Contador que só cresce (ex.: mensagens recebidas)."""
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, labels=()):
+        super().__init__(nome, ajuda, labels)
+        self._valores = {}
+
+    def inc(self, *labels, valor=1):
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, *labels):
+        return self._valores.get(self._chave(labels), 0)
+
+    def render(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        return self.cabecalho() + [
+            f"{self.nome}{_formatar_labels(self.labels, chave)} {valor}" for chave, valor in itens
+        ]
+
+
+class Gauge(_Metrica):
+    """
+    Valor que sobe e desce. Com `funcao`, o valor é lido só na hora da coleta
+    (sem custo nenhum no caminho das mensagens).
+    """
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, labels=(), funcao=None):
+        super().__init__(nome, ajuda, labels)
+        self._valores = {}
+        self._funcao = funcao
+
+    def inc(self, *labels, valor=1):
+        chave = self._chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def dec(self, *labels, valor=1):
+        self.inc(*labels, valor=-valor)
+
+    def set(self, *labels, valor):
+        with self._lock:
+            self._valores[self._chave(labels)] = valor
+
+    def render(self):
+        if self._funcao is not None:
+            valor = self._funcao()
+            if valor is None:
+                return []
+            return self.cabecalho() + [f"{self.nome} {valor}"]
+        with self._lock:
+            itens = list(self._valores.items())
+        return self.cabecalho() + [
+            f"{self.nome}{_formatar_labels(self.labels, chave)} {valor}" for chave, valor in itens
+        ]
+
+
+class Histogram(_Metrica):
+    """Distribuição de valores em faixas fixas (ex.: latência em segundos)."""
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, labels=(), buckets=LATENCIA_BUCKETS):
+        super().__init__(nome, ajuda, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, valor, *labels):
+        chave = self._chave(labels)
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                # contagens por faixa (a última é +Inf), soma e total
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def render(self):
+        with self._lock:
+            itens = [(chave, (list(s[0]), s[1], s[2])) for chave, s in self._series.items()]
+        linhas = self.cabecalho()
+        for chave, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + ("+Inf",), contagens):
+                acumulado += contagem
+                labels = _formatar_labels(self.labels, chave, ("le", limite))
+                linhas.append(f"{self.nome}_bucket{labels} {acumulado}")
+            labels = _formatar_labels(self.labels, chave)
+            linhas.append(f"{self.nome}_sum{labels} {soma}")
+            linhas.append(f"{self.nome}_count{labels} {total}")
+        return linhas
+
+
+class Registry:
+    """
+    Conjunto de métricas exportado no formato texto do Prometheus.
+    `coletores` são funções chamadas na hora da coleta que devolvem linhas
+    prontas, para métricas que já existem em outro lugar (ex.: KeyManager.stats()).
+    """
+    def __init__(self):
+        self._metricas = []
+        self._coletores = []
+
+    def _registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def counter(self, nome, ajuda, labels=()):
+        return self._registrar(Counter(nome, ajuda, labels))
+
+    def gauge(self, nome, ajuda, labels=(), funcao=None):
+        return self._registrar(Gauge(nome, ajuda, labels, funcao))
+
+    def histogram(self, nome, ajuda, labels=(), buckets=LATENCIA_BUCKETS):
+        return self._registrar(Histogram(nome, ajuda, labels, buckets))
+
+    def coletor(self, funcao):
+        self._coletores.append(funcao)
+        return funcao
+
+    def render(self):
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.render())
+        for coletor in self._coletores:
+            linhas.extend(coletor())
+        return "\n".join(linhas) + "\n"
@@ -0,0 +1,504 @@
+"""
+Respostas locais para dúvidas simples de ortografia, sem chamar o Gemini.
+
+Reconhece perguntas como "como se escreve excessão?", "é concerteza ou com
+certeza?" e "mas ou mais?" e responde com modelos prontos usando:
+
+- uma tabela curada de erros comuns e de pares que costumam confundir;
+- opcionalmente, uma lista de palavras do português (ORTOFIX_PALAVRAS, um
+  arquivo texto com uma palavra por linha; também aceita o .dic do Hunspell).
+  Ela é compilada num índice binário (ORTOFIX_PALAVRAS_IDX, padrão
+  <lista>.idx) que é aberto com mmap, então a memória é compartilhada entre
+  workers. A compilação nunca acontece durante uma consulta: ou é feita antes
+  (comando abaixo) ou por preparar_indice() na subida do servidor, fora do
+  loop; enquanto o índice não fica pronto, as perguntas que dependem dele
+  seguem para o Gemini.
+
+Quando não há certeza, responder_localmente() retorna None e a pergunta
+segue para o Gemini.
+
+Para compilar o índice manualmente:
+    python ortografia.py compilar palavras.txt palavras.idx
+"""
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+
+
+def dobrar_acentos(texto):
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)
+    )
+
+
+# ---------------- TABELA CURADA ----------------
+# Forma errada (sem acentos, minúscula) -> (forma correta, explicação curta)
+ERROS_COMUNS = {
+    "excessao": ("exceção", "Vem de exceto, por isso leva ç e não ss. Exemplo: toda regra tem uma exceção."),
+    "exessao": ("exceção", "Vem de exceto, por isso leva ç. Exemplo: toda regra tem uma exceção."),
+    "excecao": ("exceção", "Leva ç e acento til no final. Exemplo: toda regra tem uma exceção."),
+    "concerteza": ("com certeza", "É sempre separado: com + certeza. Exemplo: com certeza vou estudar hoje."),
+    "comcerteza": ("com certeza", "É sempre separado: com + certeza. Exemplo: com certeza vou estudar hoje."),
+    "derrepente": ("de repente", "É separado: de + repente. Exemplo: de repente começou a chover."),
+    "apartir": ("a partir", "É separado: a + partir. Exemplo: a partir de hoje vou ler mais."),
+    "porisso": ("por isso", "É separado: por + isso. Exemplo: choveu, por isso fiquei em casa."),
+    "mecher": ("mexer", "Mexer é com x. Exemplo: não pode mexer no bolo."),
+    "enchergar": ("enxergar", "Depois de en- usamos x. Exemplo: sem óculos não consigo enxergar."),
+    "enxer": ("encher", "Encher vem de cheio, por isso fica com ch. Exemplo: vou encher o copo."),
+    "previlegio": ("privilégio", "Começa com pri-. Exemplo: foi um privilégio participar."),
+    "beneficiente": ("beneficente", "Não tem i antes do -ente. Exemplo: uma festa beneficente."),
+    "mortandela": ("mortadela", "Não tem n depois do a. Exemplo: pão com mortadela."),
+    "asteristico": ("asterisco", "Termina em -isco. Exemplo: o asterisco indica uma nota."),
+    "impecilho": ("empecilho", "Começa com em-. Exemplo: a chuva não foi empecilho."),
+    "iorgute": ("iogurte", "O r vem depois do u. Exemplo: comi um iogurte de morango."),
+    "menas": ("menos", "Menos nunca muda, nem no feminino. Exemplo: hoje tem menos pessoas."),
+    "seje": ("seja", "É do verbo ser, e não tem j. Exemplo: espero que seja um bom dia."),
+    "esteje": ("esteja", "É do verbo estar, e não tem j. Exemplo: espero que você esteja bem."),
+    "poblema": ("problema", "Tem r depois do p. Exemplo: resolvi o problema de matemática."),
+    "pobrema": ("problema", "É pro-ble-ma. Exemplo: resolvi o problema de matemática."),
+    "advinhar": ("adivinhar", "Tem i depois do d. Exemplo: tente adivinhar a resposta."),
+    "metereologia": ("meteorologia", "Vem de meteoro. Exemplo: a meteorologia previu chuva."),
+    "paralizar": ("paralisar", "Vem de paralisia, por isso é com s. Exemplo: a greve vai paralisar as aulas."),
+    "analizar": ("analisar", "Vem de análise, por isso é com s. Exemplo: vamos analisar o texto."),
+    "pesquizar": ("pesquisar", "Vem de pesquisa, por isso é com s. Exemplo: preciso pesquisar sobre o tema."),
+    "ancioso": ("ansioso", "É com s, como ansiedade. Exemplo: estou ansioso para as férias."),
+    "exitar": ("hesitar", "Começa com h e tem s. Exemplo: não hesite em perguntar."),
+    "gratuito": ("gratuito", "Não tem acento e a sílaba forte é tu: gra-tui-to."),
+    "losangulo": ("losango", "Não tem -ulo no final. Exemplo: desenhe um losango."),
+    "cabelereiro": ("cabeleireiro", "Tem ei duas vezes: ca-be-lei-rei-ro."),
+    "bandeija": ("bandeja", "Não tem i: ban-de-ja. Exemplo: trouxe o lanche na bandeja."),
+    "carangueijo": ("caranguejo", "Não tem i: ca-ran-gue-jo."),
+    "frustado": ("frustrado", "Tem r depois do t: frus-tra-do."),
+    "largatixa": ("lagartixa", "O r vem depois do ga: la-gar-ti-xa."),
+    "sombrancelha": ("sobrancelha", "Não tem m: so-bran-ce-lha."),
+    "mendingo": ("mendigo", "Não tem n antes do g: men-di-go."),
+    "entertido": ("entretido", "É en-tre-ti-do. Exemplo: fiquei entretido com o livro."),
+    "prazeiroso": ("prazeroso", "Vem de prazer, sem i: pra-ze-ro-so."),
+    "prazeirosa": ("prazerosa", "Vem de prazer, sem i: pra-ze-ro-sa."),
+    "xuxu": ("chuchu", "É com ch: chu-chu."),
+    "cincoenta": ("cinquenta", "Escreve-se com qu, e o u é pronunciado. Exemplo: tenho cinquenta figurinhas."),
+    "quizer": ("quiser", "Os verbos querer e pôr usam s: quiser, quis, pus."),
+    "atraz": ("atrás", "Atrás indica lugar e é com s. Exemplo: ele está atrás da porta."),
+    "atravez": ("através", "É com s e acento: a-tra-vés."),
+    "previnir": ("prevenir", "É pre-ve-nir. Exemplo: é melhor prevenir do que remediar."),
+    "compania": ("companhia", "Tem nh: com-pa-nhi-a. Exemplo: obrigado pela companhia."),
+    "rubrica": ("rubrica", "Não tem acento e a sílaba forte é bri: ru-bri-ca."),
+}
+
+# Pares (ou grupos) que costumam confundir -> explicação de quando usar cada um
+PARES_CONFUSOS = [
+    ({"mas", "mais"},
+     "Mas indica oposição, como porém: quero ir, mas está chovendo. "
+     "Mais indica quantidade, o contrário de menos: quero mais suco."),
+    ({"mal", "mau"},
+     "Mal é o contrário de bem: ele dormiu mal. "
+     "Mau é o contrário de bom: ele não é um mau aluno."),
+    ({"por que", "porque", "por quê", "porquê"},
+     "Por que (separado) é usado em perguntas: por que você saiu? "
+     "Porque (junto) é usado em respostas: saí porque estava cansado. "
+     "Por quê (separado e com acento) aparece no fim da frase: você saiu por quê? "
+     "Porquê (junto e com acento) é substantivo: não sei o porquê da briga."),
+    ({"onde", "aonde"},
+     "Onde indica lugar fixo: onde você mora? "
+     "Aonde indica movimento, com verbos como ir: aonde você vai?"),
+    ({"a gente", "agente"},
+     "A gente (separado) significa nós: a gente vai ao cinema. "
+     "Agente (junto) é quem age, como agente de trânsito."),
+    ({"há", "a"},
+     "Há indica tempo passado: estudo aqui há dois anos. "
+     "A indica tempo futuro ou distância: a prova será daqui a dois dias."),
+    ({"senão", "se não"},
+     "Senão significa caso contrário: estude, senão vai mal na prova. "
+     "Se não indica condição: se não chover, vamos ao parque."),
+    ({"afim", "a fim"},
+     "A fim (separado) indica finalidade ou vontade: estou a fim de sair. "
+     "Afim (junto) significa parecido, com afinidade: temos gostos afins."),
+    ({"trás", "traz"},
+     "Trás indica lugar, atrás: olhe para trás. "
+     "Traz é do verbo trazer: ela traz o lanche todo dia."),
+    ({"sessão", "seção", "cessão"},
+     "Sessão é um período de tempo: sessão de cinema. "
+     "Seção é uma parte ou departamento: seção de brinquedos. "
+     "Cessão é o ato de ceder: cessão de direitos."),
+    ({"conserto", "concerto"},
+     "Conserto é o ato de consertar: o conserto da bicicleta. "
+     "Concerto é uma apresentação musical: o concerto da orquestra."),
+    ({"acender", "ascender"},
+     "Acender é pôr fogo ou ligar: acender a luz. "
+     "Ascender é subir: ascender ao topo da montanha."),
+    ({"tampouco", "tão pouco"},
+     "Tampouco significa também não: não fui, tampouco ela. "
+     "Tão pouco indica quantidade pequena: comeu tão pouco hoje."),
+    ({"demais", "de mais"},
+     "Demais significa muito ou os outros: o filme é bom demais. "
+     "De mais é o contrário de de menos: não vi nada de mais."),
+    ({"mim", "eu"},
+     "Antes de verbo no infinitivo usamos eu: isso é para eu fazer. "
+     "Mim aparece depois de preposição sem verbo: isso é para mim."),
+]
+
+
+# ---------------- ÍNDICE DE PALAVRAS (mmap) ----------------
+_MAGICO = b"ORTOIDX1"
+_CABECALHO = struct.Struct("<8sIIII")
+_UINT = struct.Struct("<I")
+
+
+def _delecoes(palavra):
+    return {palavra[:i] + palavra[i + 1:] for i in range(len(palavra))}
+
+
+def _distancia_ate_1(a, b):
+    """Diz se a distância de edição (com transposição) entre a e b é no máximo 1."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return (a[i + 1:] == b[i + 1:]
+                or (i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]))
+    return a[i:] == b[i + 1:]
+
+
+def _distancia(a, b):
+    """Distância de edição (Levenshtein) entre duas palavras curtas."""
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i]
+        for j, cb in enumerate(b, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        anterior = atual
+    return anterior[-1]
+
+
+def _ler_lista(caminho):
+    palavras = set()
+    with open(caminho, encoding="utf-8", errors="ignore") as f:
+        for linha in f:
+            palavra = linha.split("/", 1)[0].strip().lower()
+            if palavra and not any(c.isdigit() for c in palavra) and " " not in palavra:
+                palavras.add(palavra)
+    return palavras
+
+
+def compilar_indice(caminho_lista, caminho_indice):
+    """
+    Gera o índice binário a partir da lista de palavras. Layout:
+    cabeçalho | offsets das palavras | offsets das deleções | palavras | deleções.
+    As palavras ficam ordenadas pelos bytes UTF-8 (para busca binária) e cada
+    deleção (forma sem acentos com uma letra a menos, estilo SymSpell) aponta
+    para as palavras que a geram.
+    """
+    palavras = sorted(_ler_lista(caminho_lista), key=lambda p: p.encode("utf-8"))
+    delecoes = {}
+    for indice, palavra in enumerate(palavras):
+        dobrada = dobrar_acentos(palavra)
+        for chave in _delecoes(dobrada) | {dobrada}:
+            delecoes.setdefault(chave, []).append(indice)
+
+    blocos_palavras = [p.encode("utf-8") for p in palavras]
+    blocos_delecoes = [
+        chave.encode("utf-8") + b"\0" + b",".join(str(i).encode() for i in indices)
+        for chave, indices in sorted(delecoes.items(), key=lambda item: item[0].encode("utf-8"))
+    ]
+
+    def offsets(blocos):
+        posicoes, posicao = [], 0
+        for bloco in blocos:
+            posicoes.append(posicao)
+            posicao += len(bloco)
+        posicoes.append(posicao)
+        return b"".join(_UINT.pack(p) for p in posicoes)
+
+    # Arquivo temporário único: workers compilando ao mesmo tempo não se atrapalham,
+    # e o os.replace() final é atômico
+    pasta, nome = os.path.split(os.path.abspath(caminho_indice))
+    descritor, temporario = tempfile.mkstemp(prefix=nome + ".", suffix=".tmp", dir=pasta)
+    try:
+        with os.fdopen(descritor, "wb") as f:
+            f.write(_CABECALHO.pack(
+                _MAGICO, len(blocos_palavras), len(blocos_delecoes),
+                sum(map(len, blocos_palavras)), sum(map(len, blocos_delecoes))
+            ))
+            f.write(offsets(blocos_palavras))
+            f.write(offsets(blocos_delecoes))
+            f.writelines(blocos_palavras)
+            f.writelines(blocos_delecoes)
+        os.chmod(temporario, 0o644)  # mkstemp cria só com permissão do dono
+        os.replace(temporario, caminho_indice)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+
+class IndicePalavras:
+    """
+    Lista de palavras compilada, lida direto do arquivo via mmap.
+    Cada consulta é uma busca binária, sem carregar a lista na memória.
+    """
+    def __init__(self, caminho_indice):
+        with open(caminho_indice, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magico, self.n_palavras, self.n_delecoes, tam_palavras, _ = _CABECALHO.unpack_from(self._mm, 0)
+        if magico != _MAGICO:
+            raise ValueError(f"{caminho_indice} não é um índice de palavras do OrtoFix.")
+        self._off_palavras = _CABECALHO.size
+        self._off_delecoes = self._off_palavras + (self.n_palavras + 1) * _UINT.size
+        self._dados_palavras = self._off_delecoes + (self.n_delecoes + 1) * _UINT.size
+        self._dados_delecoes = self._dados_palavras + tam_palavras
+
+    def _item(self, tabela, dados, i):
+        inicio = _UINT.unpack_from(self._mm, tabela + i * _UINT.size)[0]
+        fim = _UINT.unpack_from(self._mm, tabela + (i + 1) * _UINT.size)[0]
+        return self._mm[dados + inicio:dados + fim]
+
+    def palavra(self, i):
+        return self._item(self._off_palavras, self._dados_palavras, i).decode("utf-8")
+
+    def contem(self, palavra):
+        alvo = palavra.encode("utf-8")
+        baixo, alto = 0, self.n_palavras
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            atual = self._item(self._off_palavras, self._dados_palavras, meio)
+            if atual < alvo:
+                baixo = meio + 1
+            elif atual > alvo:
+                alto = meio
+            else:
+                return True
+        return False
+
+    def _delecao(self, chave):
+        alvo = chave.encode("utf-8")
+        baixo, alto = 0, self.n_delecoes
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            item = self._item(self._off_delecoes, self._dados_delecoes, meio)
+            atual, _, indices = item.partition(b"\0")
+            if atual < alvo:
+                baixo = meio + 1
+            elif atual > alvo:
+                alto = meio
+            else:
+                return [int(i) for i in indices.split(b",")]
+        return []
+
+    def sugestoes(self, palavra):
+        """
+        Palavras a no máximo uma edição de distância, ignorando acentos.
+        Retorna (so_acentos, uma_edicao): as que diferem só nos acentos e as demais.
+        """
+        dobrada = dobrar_acentos(palavra)
+        indices = set()
+        for chave in _delecoes(dobrada) | {dobrada}:
+            indices.update(self._delecao(chave))
+        so_acentos, uma_edicao = [], []
+        for i in sorted(indices):
+            candidata = self.palavra(i)
+            if candidata == palavra:
+                continue
+            candidata_dobrada = dobrar_acentos(candidata)
+            if candidata_dobrada == dobrada:
+                so_acentos.append(candidata)
+            elif _distancia_ate_1(candidata_dobrada, dobrada):
+                uma_edicao.append(candidata)
+        return so_acentos, uma_edicao
+
+
+logger = logging.getLogger("ortofix.ortografia")
+
+_indice = None
+_indice_carregado = False
+_lock_indice = threading.Lock()
+
+
+def _caminhos_indice():
+    lista = os.getenv("ORTOFIX_PALAVRAS")
+    caminho = os.getenv("ORTOFIX_PALAVRAS_IDX") or (lista + ".idx" if lista else None)
+    return lista, caminho
+
+
+def _indice_desatualizado(lista, caminho):
+    return not os.path.exists(caminho) or os.path.getmtime(caminho) < os.path.getmtime(lista)
+
+
+def preparar_indice(executor=None):
+    """
+    Compila a lista (se o índice não existir ou estiver desatualizado) e abre
+    o índice. Feita para a subida do servidor: `executor` (ex.:
+    eventlet.tpool.execute) roda a compilação, que leva segundos, fora do loop.
+    """
+    global _indice, _indice_carregado
+    lista, caminho = _caminhos_indice()
+    if lista and caminho and _indice_desatualizado(lista, caminho):
+        inicio = time.perf_counter()
+        try:
+            (executor or (lambda fn, *args: fn(*args)))(compilar_indice, lista, caminho)
+            logger.info("indice_compilado caminho=%s duracao_s=%.1f", caminho, time.perf_counter() - inicio)
+        except Exception as e:
+            # Sem índice novo, usa o antigo (se houver) e as perguntas que dependem dele vão ao Gemini
+            logger.error("erro_compilando_indice lista=%s erro=%s", lista, e)
+    with _lock_indice:
+        if caminho and os.path.exists(caminho):
+            _indice = IndicePalavras(caminho)
+        _indice_carregado = True
+        return _indice
+
+
+def obter_indice():
+    """
+    Retorna o índice, abrindo-o na primeira chamada se o arquivo já existir.
+    Nunca compila (ver preparar_indice): sem índice pronto, retorna None.
+    """
+    global _indice, _indice_carregado
+    if _indice_carregado:
+        return _indice
+    with _lock_indice:
+        if _indice_carregado:
+            return _indice
+        _, caminho = _caminhos_indice()
+        if caminho and os.path.exists(caminho):
+            _indice = IndicePalavras(caminho)
+        _indice_carregado = True
+        return _indice
+
+
+# ---------------- DETECÇÃO DAS PERGUNTAS ----------------
+_PONTUACAO = re.compile(r"[\"'“”‘’?!.,;:()]+")
+_ESPACOS = re.compile(r"\s+")
+_SAUDACAO = re.compile(r"^(?:oi|olá|ola|bom dia|boa tarde|boa noite|ortofix)\s+")
+_COMO_ESCREVE = re.compile(
+    r"^(?:como (?:é que )?(?:se )?escreve(?:-se)?|como (?:eu )?escrevo|como fica|"
+    r"qual (?:é )?a (?:forma|grafia|escrita) (?:correta|certa) de) "
+    r"(?:a palavra )?(?P<palavra>[\w-]+)$"
+)
+_ESTA_CERTO = re.compile(
+    r"^(?:a palavra )?(?P<palavra>[\w-]+) (?:está|esta|tá|ta) (?:certo|correto|errado|certa|correta|errada)$"
+    r"|^a palavra (?P<palavra2>[\w-]+) existe$"
+)
+_COM_LETRA = re.compile(
+    r"^(?:como se escreve )?(?P<palavra>[\w-]+) (?:se escreve |é |e )?com (?:[\wç]{1,3}) ou (?:com )?(?:[\wç]{1,3})$"
+)
+_OU = re.compile(
+    r"^(?:(?:qual (?:é )?(?:o )?(?:certo|correto|a forma correta)|o (?:certo|correto) é|"
+    r"é|eh|e|se escreve|escreve-se|como (?:se )?escreve|usa-se|uso) )?"
+    r"(?P<a>[\w-]+(?: [\w-]+){0,2}) ou (?P<b>[\w-]+(?: [\w-]+){0,2})$"
+)
+
+
+def _limpar_pergunta(mensagem):
+    texto = _ESPACOS.sub(" ", _PONTUACAO.sub(" ", mensagem.lower())).strip()
+    return _SAUDACAO.sub("", texto)
+
+
+# ---------------- RESPOSTAS ----------------
+def _explicar_confusao(opcoes):
+    """Explicação do grupo de PARES_CONFUSOS que contém todas as `opcoes`, ou None."""
+    dobradas = {dobrar_acentos(o) for o in opcoes}
+    for grupo, explicacao in PARES_CONFUSOS:
+        if opcoes <= grupo:
+            return explicacao
+        # Sem acentos só vale se o aluno apenas os omitiu ("ha ou a"): as opções
+        # continuam distintas, nenhuma é outra palavra acentuada ("à", "más") e
+        # o grupo não tem formas que viram a mesma coisa
+        grupo_dobrado = {dobrar_acentos(g) for g in grupo}
+        if (len(grupo_dobrado) == len(grupo) and len(dobradas) == len(opcoes)
+                and all(o in grupo or o == dobrar_acentos(o) for o in opcoes)
+                and dobradas <= grupo_dobrado):
+            return explicacao
+    return None
+
+
+def _responder_par(a, b):
+    explicacao = _explicar_confusao({a, b})
+    if explicacao:
+        return explicacao
+
+    for errada, outra in ((a, b), (b, a)):
+        conhecido = ERROS_COMUNS.get(dobrar_acentos(errada).replace(" ", ""))
+        if conhecido and dobrar_acentos(conhecido[0]) == dobrar_acentos(outra):
+            return f"O certo é {conhecido[0]}. {conhecido[1]}"
+
+    indice = obter_indice()
+    if indice is None or " " in a or " " in b:
+        return None
+    # Só decide pela lista se as duas opções forem grafias parecidas da mesma palavra
+    # ("chá ou café" é outra pergunta)
+    a_dobrada, b_dobrada = dobrar_acentos(a), dobrar_acentos(b)
+    if _distancia(a_dobrada, b_dobrada) > max(1, min(2, len(a_dobrada) // 3)):
+        return None
+    a_existe, b_existe = indice.contem(a), indice.contem(b)
+    if a_existe != b_existe:
+        correta = a if a_existe else b
+        return f"O certo é {correta}."
+    return None
+
+
+def _responder_palavra(palavra):
+    # "Como se escreve sessão?" depende do sentido: a lista diria que está certa
+    explicacao = _explicar_confusao({palavra})
+    if explicacao:
+        return explicacao
+
+    conhecido = ERROS_COMUNS.get(dobrar_acentos(palavra))
+    if conhecido:
+        correta, explicacao = conhecido
+        if correta == palavra:
+            return f"{palavra.capitalize()} está escrita corretamente! {explicacao}"
+        return f"O certo é {correta}. {explicacao}"
+
+    indice = obter_indice()
+    if indice is None or len(palavra) < 3:
+        return None
+    if indice.contem(palavra):
+        return f"{palavra.capitalize()} está escrita corretamente!"
+    so_acentos, uma_edicao = indice.sugestoes(palavra)
+    if len(so_acentos) == 1:
+        return f"O certo é {so_acentos[0]}, com acento."
+    if not so_acentos and len(uma_edicao) == 1:
+        return f"O certo é {uma_edicao[0]}."
+    return None
+
+
+def responder_localmente(mensagem):
+    """
+    Responde a mensagem se ela for uma consulta simples de ortografia e a
+    resposta for certa; caso contrário retorna None.
+    """
+    if len(mensagem) > 120:
+        return None
+    texto = _limpar_pergunta(mensagem)
+
+    encontrado = _COMO_ESCREVE.match(texto) or _COM_LETRA.match(texto)
+    if encontrado:
+        return _responder_palavra(encontrado.group("palavra"))
+
+    encontrado = _ESTA_CERTO.match(texto)
+    if encontrado:
+        return _responder_palavra(encontrado.group("palavra") or encontrado.group("palavra2"))
+
+    encontrado = _OU.match(texto)
+    if encontrado:
+        return _responder_par(encontrado.group("a"), encontrado.group("b"))
+    return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "compilar":
+        compilar_indice(sys.argv[2], sys.argv[3])
+        print(f"Índice gravado em {sys.argv[3]}")
+    else:
+        print("Uso: python ortografia.py compilar palavras.txt palavras.idx")
@@ -12,6 +12,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const uploadButton = document.getElementById('upload-button');
     const imageInput = document.getElementById('image-input');
     let userSessionId = null;
+    // Balão do bot que está recebendo a resposta em streaming (null quando não há resposta em andamento)
+    let bolhaStreaming = null;
+    let textoStreaming = '';
 
     // Função para adicionar mensagens no chat
     function addMessageToChat(sender, text, type = 'normal') {
@@ -56,6 +59,27 @@ document.addEventListener('DOMContentLoaded', () => {
         messageElement.appendChild(textSpan);
         chatBox.appendChild(messageElement);
         chatBox.scrollTop = chatBox.scrollHeight;
+        return textSpan;
+    }
+
+    // Acrescenta um pedaço da resposta em streaming no mesmo balão do bot
+    function appendChunkToBot(text) {
+        if (bolhaStreaming === null) {
+            textoStreaming = '';
+            bolhaStreaming = addMessageToChat('bot', '');
+        }
+        textoStreaming += text;
+        bolhaStreaming.innerHTML = textoStreaming.replace(/\n/g, '<br>');
+        chatBox.scrollTop = chatBox.scrollHeight;
+    }
+
+    // Fecha o balão atual; se nenhum pedaço chegou, mostra o texto final de uma vez
+    function finishBotStream(text) {
+        if (bolhaStreaming === null && text) {
+            addMessageToChat('bot', text);
+        }
+        bolhaStreaming = null;
+        textoStreaming = '';
     }
 
     // Função para habilitar/desabilitar o chat
@@ -73,7 +97,13 @@ document.addEventListener('DOMContentLoaded', () => {
     // Função para conectar ao servidor
     function iniciarConversa() {
         if (socket && socket.connected) return;
-        socket = io('http://localhost:5000');
+        // Na reconexão envia o session_id recebido antes, para o servidor retomar a conversa.
+        // Só websocket: o long-polling precisa de sessões fixas (sticky) no balanceador
+        // quando há vários workers.
+        socket = io('http://localhost:5000', {
+            transports: ['websocket'],
+            auth: (cb) => cb(userSessionId ? { session_id: userSessionId } : {})
+        });
         socket.on('connect', () => {
             console.log('Conectado ao servidor Socket.IO! SID:', socket.id);
             connectionStatus.textContent = 'Conectado';
@@ -96,7 +126,17 @@ document.addEventListener('DOMContentLoaded', () => {
         socket.on('nova_mensagem', (data) => {
             addMessageToChat(data.remetente, data.texto);
         });
+        socket.on('nova_mensagem_parcial', (data) => {
+            appendChunkToBot(data.texto);
+        });
+        socket.on('nova_mensagem_fim', (data) => {
+            finishBotStream(data.texto);
+            if (data.latencia_primeiro_chunk_ms !== null && data.latencia_primeiro_chunk_ms !== undefined) {
+                console.log(`Primeiro pedaço em ${data.latencia_primeiro_chunk_ms} ms, total ${data.latencia_total_ms} ms`);
+            }
+        });
         socket.on('erro', (data) => {
+            finishBotStream('');
             addMessageToChat('Erro', data.erro, 'error');
         });
     }
@@ -0,0 +1,250 @@
+import threading
+import time
+from collections import OrderedDict
+
+from google.genai import types
+
+
+class SessionRegistry:
+    """
+    Guarda os chats ativos por session_id com limite de memória.
+
+    - No máximo `max_entries` sessões; ao passar disso a menos usada
+      recentemente (LRU) é descartada.
+    - Sessões sem uso há mais de `ttl` segundos expiram.
+    - Quando o último socket de uma sessão desconecta, ela ainda fica
+      disponível por `disconnect_grace` segundos (para reconexões rápidas)
+      e depois é removida.
+
+    A limpeza é feita de forma preguiçosa nas próprias chamadas de get/put,
+    então não há timers nem threads extras.
+    """
+    def __init__(self, max_entries=1000, ttl=1800, disconnect_grace=120,
+                 sweep_interval=30, clock=time.monotonic):
+        """
+        Args:
+            max_entries (int): Número máximo de sessões guardadas.
+            ttl (float): Segundos sem uso até a sessão expirar.
+            disconnect_grace (float): Segundos mantidos depois da desconexão.
+            sweep_interval (float): Intervalo mínimo entre varreduras completas.
+            clock (callable): Relógio em segundos (injetável para testes).
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disconnect_grace = disconnect_grace
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._conexoes = {}
+        self._desconectadas = {}
+        self._ultima_varredura = clock()
+        self.evictions = 0
+
+    def get(self, session_id):
+        """
+        Retorna o valor da sessão (marcando-a como usada) ou None.
+        """
+        with self._lock:
+            agora = self._clock()
+            self._varrer(agora)
+            entrada = self._entradas.get(session_id)
+            if entrada is None:
+                return None
+            prazo = self._desconectadas.get(session_id)
+            if agora - entrada[1] > self.ttl or (prazo is not None and agora >= prazo):
+                self._remover(session_id)
+                return None
+            entrada[1] = agora
+            self._entradas.move_to_end(session_id)
+            return entrada[0]
+
+    def put(self, session_id, valor):
+        """
+        Guarda (ou substitui) o valor da sessão, descartando a sessão LRU se necessário.
+        """
+        with self._lock:
+            agora = self._clock()
+            self._varrer(agora)
+            self._entradas[session_id] = [valor, agora]
+            self._entradas.move_to_end(session_id)
+            while len(self._entradas) > self.max_entries:
+                mais_antiga = next(iter(self._entradas))
+                self._remover(mais_antiga)
+
+    def remove(self, session_id):
+        with self._lock:
+            self._remover(session_id)
+
+    def mark_connected(self, session_id):
+        """
+        Registra um socket conectado à sessão e cancela a remoção pendente.
+        """
+        with self._lock:
+            self._conexoes[session_id] = self._conexoes.get(session_id, 0) + 1
+            self._desconectadas.pop(session_id, None)
+
+    def mark_disconnected(self, session_id):
+        """
+        Registra a saída de um socket; sem sockets restantes, a sessão entra
+        no período de graça e é removida quando ele acabar.
+        """
+        with self._lock:
+            restantes = self._conexoes.get(session_id, 1) - 1
+            if restantes > 0:
+                self._conexoes[session_id] = restantes
+                return
+            self._conexoes.pop(session_id, None)
+            self._desconectadas[session_id] = self._clock() + self.disconnect_grace
+
+    def _varrer(self, agora):
+        if agora - self._ultima_varredura < self.sweep_interval:
+            return
+        self._ultima_varredura = agora
+
+        # Sessões cujo período de graça acabou
+        for session_id, prazo in list(self._desconectadas.items()):
+            if agora >= prazo:
+                self._remover(session_id)
+
+        # O OrderedDict está em ordem de uso, então as expiradas ficam no começo
+        while self._entradas:
+            session_id, (_, ultimo_uso) = next(iter(self._entradas.items()))
+            if agora - ultimo_uso <= self.ttl:
+                break
+            self._remover(session_id)
+
+    def _remover(self, session_id):
+        if self._entradas.pop(session_id, None) is not None:
+            self.evictions += 1
+        self._desconectadas.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, session_id):
+        return session_id in self._entradas
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memoria",
+                "sessoes": len(self._entradas),
+                "aguardando_remocao": len(self._desconectadas),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+            }
+
+
+class HistoryPolicy:
+    """
+    Limita o histórico que é reenviado ao modelo a cada turno.
+
+    Quando o histórico passa de `max_turns` turnos (pergunta + resposta) ou de
+    `max_tokens` tokens estimados, os turnos mais antigos são retirados e
+    trocados por um resumo curto feito localmente com as perguntas antigas
+    do aluno, sem nenhuma chamada extra ao Gemini.
+    """
+    # Estimativa grosseira usada pela própria documentação do Gemini (~4 caracteres por token)
+    CARACTERES_POR_TOKEN = 4
+    PREFIXO_RESUMO = "Resumo da conversa até aqui. Perguntas anteriores do aluno: "
+
+    def __init__(self, max_turns=10, max_tokens=3000, max_summary_chars=400):
+        """
+        Args:
+            max_turns (int): Turnos mantidos por completo.
+            max_tokens (int): Tokens estimados permitidos no histórico.
+            max_summary_chars (int): Tamanho máximo do resumo dos turnos retirados.
+        """
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.max_summary_chars = max_summary_chars
+
+    @classmethod
+    def estimar_tokens(cls, conteudos):
+        caracteres = sum(
+            len(parte.text or "")
+            for conteudo in conteudos
+            for parte in (conteudo.parts or [])
+        )
+        return caracteres // cls.CARACTERES_POR_TOKEN
+
+    @staticmethod
+    def _dividir_turnos(historico):
+        turnos = []
+        for conteudo in historico:
+            if conteudo.role == "user" or not turnos:
+                turnos.append([conteudo])
+            else:
+                turnos[-1].append(conteudo)
+        return turnos
+
+    @staticmethod
+    def juntar_pedacos(historico):
+        """
+        Junta conteúdos seguidos do mesmo papel que só têm texto (uma resposta
+        em streaming é gravada pelo SDK como um conteúdo por pedaço).
+        """
+        juntos = []
+        for conteudo in historico:
+            so_texto = all(p.text is not None for p in (conteudo.parts or []))
+            anterior = juntos[-1] if juntos else None
+            if (anterior is not None and so_texto and anterior.role == conteudo.role
+                    and all(p.text is not None for p in (anterior.parts or []))):
+                texto = "".join(p.text for p in (anterior.parts or []) + (conteudo.parts or []))
+                juntos[-1] = types.Content(role=conteudo.role, parts=[types.Part(text=texto)])
+            else:
+                juntos.append(conteudo)
+        return juntos
+
+    def compactar(self, historico):
+        """
+        Retorna o histórico compactado, ou None se ele já está dentro dos limites.
+        """
+        turnos = self._dividir_turnos(historico)
+        # O resumo de uma compactação anterior não conta como turno
+        completos = len(turnos) - (1 if turnos and self._eh_resumo(turnos[0][0]) else 0)
+        if (completos <= self.max_turns
+                and self.estimar_tokens(historico) <= self.max_tokens):
+            return None
+
+        mantidos = turnos[-self.max_turns:] if self.max_turns > 0 else []
+        while mantidos and self.estimar_tokens([c for t in mantidos for c in t]) > self.max_tokens:
+            mantidos = mantidos[1:]
+        retirados = turnos[:len(turnos) - len(mantidos)]
+
+        compactado = self._resumir(retirados)
+        for turno in mantidos:
+            compactado.extend(turno)
+        return compactado
+
+    @staticmethod
+    def _texto(conteudo):
+        return " ".join(p.text or "" for p in (conteudo.parts or [])).strip()
+
+    def _eh_resumo(self, conteudo):
+        return conteudo.role == "user" and self._texto(conteudo).startswith(self.PREFIXO_RESUMO)
+
+    def _resumir(self, turnos):
+        perguntas = []
+        for turno in turnos:
+            texto = self._texto(turno[0])
+            if self._eh_resumo(turno[0]):
+                # Resumo de uma compactação anterior: reaproveita as perguntas dele
+                texto = texto[len(self.PREFIXO_RESUMO):]
+            if texto and turno[0].role == "user":
+                perguntas.append(texto)
+        if not perguntas:
+            return []
+
+        resumo = "; ".join(perguntas)
+        if len(resumo) > self.max_summary_chars:
+            resumo = "..." + resumo[-self.max_summary_chars:]
+        return [
+            types.Content(role="user", parts=[types.Part(
+                text=self.PREFIXO_RESUMO + resumo
+            )]),
+            types.Content(role="model", parts=[types.Part(
+                text="Entendido, vou considerar essas perguntas anteriores."
+            )]),
+        ]
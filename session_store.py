@@ -0,0 +1,246 @@
+import json
+import sqlite3
+import threading
+import time
+
+from google.genai import types
+
+from session_registry import SessionRegistry
+
+
+def serializar_historico(historico):
+    """
+    Converte o histórico (lista de types.Content) em JSON, para ser guardado
+    num store compartilhado e remontado em qualquer worker.
+    """
+    return json.dumps(
+        [conteudo.model_dump(mode="json", exclude_none=True) for conteudo in historico],
+        ensure_ascii=False
+    )
+
+
+def desserializar_historico(texto):
+    return [types.Content.model_validate(conteudo) for conteudo in json.loads(texto)]
+
+
+def _executar_direto(fn, *args):
+    return fn(*args)
+
+
+class SqliteSessionStore:
+    """
+    Histórico das sessões num arquivo sqlite, compartilhado pelos workers da
+    mesma máquina. Mesma interface do SessionRegistry.
+
+    Cada sessão expira `ttl` segundos depois do último turno, ou
+    `disconnect_grace` segundos depois que o último socket dela desconecta
+    (os sockets abertos são contados na própria tabela, valendo para todos os
+    workers). Acima de `max_entries` sessões, as usadas há mais tempo são apagadas.
+
+    As chamadas ao sqlite bloqueiam (commit em disco, espera pelo lock de
+    outro worker), então rodam via `executor` (ex.: eventlet.tpool.execute),
+    uma de cada vez por processo.
+    """
+    def __init__(self, path, max_entries=1000, ttl=1800, disconnect_grace=120,
+                 sweep_interval=30, clock=time.time, executor=None):
+        """
+        Args:
+            path (str): Caminho do arquivo sqlite.
+            max_entries (int): Número máximo de sessões guardadas.
+            ttl (float): Segundos sem uso até a sessão expirar.
+            disconnect_grace (float): Segundos mantidos depois da desconexão.
+            sweep_interval (float): Intervalo mínimo entre limpezas da tabela.
+            clock (callable): Relógio em segundos desde a época (injetável para testes).
+            executor (callable): Roda as chamadas ao sqlite fora do loop
+                (ex.: eventlet.tpool.execute); por padrão chama direto.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disconnect_grace = disconnect_grace
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._executor = executor or _executar_direto
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessoes ("
+            "session_id TEXT PRIMARY KEY, historico TEXT NOT NULL, "
+            "usado_em REAL NOT NULL, expira_em REAL NOT NULL, "
+            "conexoes INTEGER NOT NULL DEFAULT 0)"
+        )
+        colunas = [linha[1] for linha in self._db.execute("PRAGMA table_info(sessoes)")]
+        if "conexoes" not in colunas:
+            # Tabela criada por uma versão anterior, sem a contagem de sockets
+            self._db.execute("ALTER TABLE sessoes ADD COLUMN conexoes INTEGER NOT NULL DEFAULT 0")
+        self._db.commit()
+        self._ultima_varredura = 0.0
+
+    def _executar(self, fn, *args):
+        # O lock fica com o greenlet chamador; o executor só faz o trabalho bloqueante
+        with self._lock:
+            return self._executor(fn, *args)
+
+    def get(self, session_id):
+        linha = self._executar(self._buscar, session_id, self._clock())
+        return desserializar_historico(linha[0]) if linha else None
+
+    def _buscar(self, session_id, agora):
+        return self._db.execute(
+            "SELECT historico FROM sessoes WHERE session_id = ? AND expira_em > ?",
+            (session_id, agora)
+        ).fetchone()
+
+    def put(self, session_id, historico):
+        self._executar(self._gravar, session_id, serializar_historico(historico), self._clock())
+
+    def _gravar(self, session_id, texto, agora):
+        self._db.execute(
+            "INSERT INTO sessoes (session_id, historico, usado_em, expira_em) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET historico = excluded.historico, "
+            "usado_em = excluded.usado_em, expira_em = excluded.expira_em",
+            (session_id, texto, agora, agora + self.ttl)
+        )
+        self._varrer(agora)
+        self._db.commit()
+
+    def remove(self, session_id):
+        self._executar(self._apagar, session_id)
+
+    def _apagar(self, session_id):
+        self._db.execute("DELETE FROM sessoes WHERE session_id = ?", (session_id,))
+        self._db.commit()
+
+    def mark_connected(self, session_id):
+        self._executar(self._conectar, session_id, self._clock())
+
+    def _conectar(self, session_id, agora):
+        self._db.execute(
+            "UPDATE sessoes SET conexoes = conexoes + 1, expira_em = MAX(expira_em, ?) "
+            "WHERE session_id = ?",
+            (agora + self.ttl, session_id)
+        )
+        self._db.commit()
+
+    def mark_disconnected(self, session_id):
+        self._executar(self._desconectar, session_id, self._clock())
+
+    def _desconectar(self, session_id, agora):
+        # Só o último socket da sessão inicia o período de graça
+        self._db.execute(
+            "UPDATE sessoes SET conexoes = MAX(conexoes - 1, 0), "
+            "expira_em = CASE WHEN conexoes <= 1 THEN MIN(expira_em, ?) ELSE expira_em END "
+            "WHERE session_id = ?",
+            (agora + self.disconnect_grace, session_id)
+        )
+        self._db.commit()
+
+    def _varrer(self, agora):
+        if agora - self._ultima_varredura < self.sweep_interval:
+            return
+        self._ultima_varredura = agora
+        self._db.execute("DELETE FROM sessoes WHERE expira_em <= ?", (agora,))
+        self._db.execute(
+            "DELETE FROM sessoes WHERE session_id IN ("
+            "SELECT session_id FROM sessoes ORDER BY usado_em DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def __len__(self):
+        return self._executar(self._contar, self._clock())
+
+    def _contar(self, agora):
+        return self._db.execute(
+            "SELECT COUNT(*) FROM sessoes WHERE expira_em > ?", (agora,)
+        ).fetchone()[0]
+
+    def stats(self):
+        return {"backend": "sqlite", "sessoes": len(self), "max_entries": self.max_entries}
+
+
+class RedisSessionStore:
+    """
+    Histórico das sessões num servidor Redis (ou qualquer servidor que fale o
+    protocolo do Redis), compartilhado por workers em várias máquinas.
+    Mesma interface do SessionRegistry.
+
+    A expiração usa o TTL das próprias chaves do Redis. Os sockets abertos de
+    cada sessão são contados numa chave separada (INCR/DECR), e só a saída do
+    último encurta a expiração para `disconnect_grace`. O limite de memória
+    fica a cargo do servidor (ex.: maxmemory-policy allkeys-lru).
+    """
+    PREFIXO = "ortofix:sessao:"
+    PREFIXO_CONEXOES = "ortofix:conexoes:"
+
+    def __init__(self, url, ttl=1800, disconnect_grace=120, client=None):
+        """
+        Args:
+            url (str): URL do servidor, ex.: redis://localhost:6379/0.
+            ttl (float): Segundos sem uso até a sessão expirar.
+            disconnect_grace (float): Segundos mantidos depois da desconexão.
+            client: Client já criado (opcional); por padrão usa redis.Redis.from_url(url).
+        """
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError(
+                    "O store de sessões em Redis precisa do pacote 'redis' (pip install redis)."
+                ) from e
+            client = redis.Redis.from_url(url)
+        self._redis = client
+        self.ttl = int(ttl)
+        self.disconnect_grace = int(disconnect_grace)
+
+    def get(self, session_id):
+        texto = self._redis.get(self.PREFIXO + session_id)
+        if texto is None:
+            return None
+        if isinstance(texto, bytes):
+            texto = texto.decode("utf-8")
+        return desserializar_historico(texto)
+
+    def put(self, session_id, historico):
+        self._redis.set(self.PREFIXO + session_id, serializar_historico(historico), ex=self.ttl)
+        self._redis.expire(self.PREFIXO_CONEXOES + session_id, self.ttl)
+
+    def remove(self, session_id):
+        self._redis.delete(self.PREFIXO + session_id, self.PREFIXO_CONEXOES + session_id)
+
+    def mark_connected(self, session_id):
+        self._redis.incr(self.PREFIXO_CONEXOES + session_id)
+        self._redis.expire(self.PREFIXO_CONEXOES + session_id, self.ttl)
+        self._redis.expire(self.PREFIXO + session_id, self.ttl)
+
+    def mark_disconnected(self, session_id):
+        restantes = self._redis.decr(self.PREFIXO_CONEXOES + session_id)
+        if restantes > 0:
+            return
+        self._redis.delete(self.PREFIXO_CONEXOES + session_id)
+        self._redis.expire(self.PREFIXO + session_id, self.disconnect_grace)
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+def criar_session_store(url=None, max_entries=1000, ttl=1800, disconnect_grace=120,
+                        executor=None):
+    """
+    Cria o store de sessões a partir de uma URL:
+
+    - vazia ou "memoria": SessionRegistry, só neste processo (um worker);
+    - "sqlite:///caminho/arquivo.db": arquivo compartilhado pelos workers da máquina;
+    - "redis://host:porta/db": servidor compartilhado entre máquinas.
+
+    `executor` roda as chamadas bloqueantes do sqlite (ex.: eventlet.tpool.execute).
+    """
+    if not url or url == "memoria":
+        return SessionRegistry(max_entries=max_entries, ttl=ttl, disconnect_grace=disconnect_grace)
+    if url.startswith("sqlite:///"):
+        return SqliteSessionStore(
+            url[len("sqlite:///"):], max_entries=max_entries, ttl=ttl,
+            disconnect_grace=disconnect_grace, executor=executor
+        )
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSessionStore(url, ttl=ttl, disconnect_grace=disconnect_grace)
+    raise ValueError(f"Store de sessões não suportado: {url}")
@@ -0,0 +1,143 @@
+import sqlite3
+import threading
+
+from answer_cache import AnswerCache, normalizar_pergunta
+
+
+class RelogioFalso:
+    def __init__(self):
+        self.agora = 1_000_000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_normalizar_pergunta():
+    assert normalizar_pergunta("Como se escreve EXCEÇÃO?!") == "como se escreve excecao"
+    assert normalizar_pergunta("  por   que\n") == "por que"
+    assert normalizar_pergunta("por que") != normalizar_pergunta("porque")
+
+
+def test_ttl_da_memoria():
+    relogio = RelogioFalso()
+    cache = AnswerCache(ttl=60, clock=relogio)
+    cache.put("a", "resposta")
+    relogio.agora += 60
+    assert cache.get("a") == "resposta"
+    relogio.agora += 1
+    assert cache.get("a") is None
+
+
+def test_lru_descarta_a_menos_usada():
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+
+def test_get_or_compute_origens(tmp_path):
+    relogio = RelogioFalso()
+    banco = str(tmp_path / "cache.db")
+    cache = AnswerCache(ttl=60, db_path=banco, clock=relogio)
+    assert cache.get_or_compute("a", lambda: "resposta") == ("resposta", "upstream")
+    assert cache.get_or_compute("a", lambda: "outra") == ("resposta", "memoria")
+
+    # Outro processo (ou um reinício) acha a resposta no disco
+    reiniciado = AnswerCache(ttl=60, db_path=banco, clock=relogio)
+    assert reiniciado.get_or_compute("a", lambda: "outra") == ("resposta", "disco")
+    relogio.agora += 61
+    assert reiniciado.get_or_compute("a", lambda: "nova") == ("nova", "upstream")
+    assert reiniciado.stats()["hits_disco"] == 1
+
+
+def test_perguntas_simultaneas_chamam_calcular_uma_vez():
+    cache = AnswerCache()
+    liberar = threading.Event()
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        liberar.wait(5)
+        return "resposta"
+
+    resultados = []
+    threads = [
+        threading.Thread(target=lambda: resultados.append(cache.get_or_compute("a", calcular)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["coalescidas"] < 4:
+        threading.Event().wait(0.005)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(chamadas) == 1
+    assert sorted(origem for _, origem in resultados) == ["coalescida"] * 4 + ["upstream"]
+    assert {resposta for resposta, _ in resultados} == {"resposta"}
+
+
+def test_erro_de_calcular_chega_a_quem_esperava():
+    cache = AnswerCache()
+    entrou = threading.Event()
+    liberar = threading.Event()
+
+    def calcular():
+        entrou.set()
+        liberar.wait(5)
+        raise RuntimeError("429")
+
+    erros = []
+
+    def perguntar():
+        try:
+            cache.get_or_compute("a", calcular)
+        except RuntimeError as e:
+            erros.append(str(e))
+
+    lider = threading.Thread(target=perguntar)
+    lider.start()
+    entrou.wait(5)
+    seguidor = threading.Thread(target=perguntar)
+    seguidor.start()
+    while cache.stats()["coalescidas"] < 1:
+        threading.Event().wait(0.005)
+    liberar.set()
+    lider.join()
+    seguidor.join()
+    assert erros == ["429", "429"]
+    assert cache.get("a") is None
+
+
+def test_falha_ao_gravar_no_disco_nao_falha_o_turno(tmp_path):
+    def executor(fn, *args):
+        if fn.__name__ == "_gravar":
+            raise sqlite3.OperationalError("database is locked")
+        return fn(*args)
+
+    cache = AnswerCache(db_path=str(tmp_path / "cache.db"), executor=executor)
+    assert cache.get_or_compute("a", lambda: "resposta") == ("resposta", "upstream")
+    assert cache.get_or_compute("a", lambda: "outra") == ("resposta", "memoria")
+
+
+def test_sqlite_usa_o_executor(tmp_path):
+    chamadas = []
+
+    def executor(fn, *args):
+        chamadas.append(fn.__name__)
+        return fn(*args)
+
+    cache = AnswerCache(db_path=str(tmp_path / "cache.db"), executor=executor)
+    cache.get_or_compute("a", lambda: "resposta")
+    assert chamadas == ["_buscar", "_gravar"]
+
+
+def test_disco_em_wal(tmp_path):
+    banco = str(tmp_path / "cache.db")
+    AnswerCache(db_path=banco)
+    assert sqlite3.connect(banco).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
@@ -0,0 +1,79 @@
+import glob
+import os
+import threading
+import time
+
+from conversation_log import ConversationLog, ler_log
+
+
+def ler_todos(tmp_path):
+    registros = []
+    for caminho in glob.glob(str(tmp_path / "conversas*.jsonl*")):
+        if not caminho.endswith(".lock"):
+            registros.extend(ler_log(caminho))
+    return registros
+
+
+def test_close_grava_o_que_esta_na_fila(tmp_path):
+    log = ConversationLog(str(tmp_path / "conversas.jsonl"), flush_interval=60)
+    for i in range(5):
+        log.log({"n": i})
+    log.close()
+    assert [r["n"] for r in ler_todos(tmp_path)] == list(range(5))
+    assert log.stats()["escritos"] == 5
+
+
+def test_dois_workers_girando_o_mesmo_arquivo_nao_perdem_registros(tmp_path):
+    caminho = str(tmp_path / "conversas.jsonl")
+    workers = [
+        ConversationLog(caminho, batch_size=3, flush_interval=0.01, max_bytes=400)
+        for _ in range(2)
+    ]
+    for i in range(300):
+        for numero, worker in enumerate(workers):
+            worker.log({"worker": numero, "n": i, "mensagem": "como se escreve exceção?"})
+        if i % 20 == 0:
+            time.sleep(0.01)
+    for worker in workers:
+        worker.close()
+
+    registros = ler_todos(tmp_path)
+    assert len(registros) == 600
+    assert {(r["worker"], r["n"]) for r in registros} == {(w, i) for w in range(2) for i in range(300)}
+    assert all(w.rotacoes for w in workers)
+    assert not glob.glob(str(tmp_path / "conversas-*.jsonl"))  # todos os girados foram compactados
+
+
+def test_gira_quando_o_arquivo_e_de_outro_dia(tmp_path):
+    caminho = str(tmp_path / "conversas.jsonl")
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write('{"n": "ontem"}\n')
+    ontem = time.time() - 86400
+    os.utime(caminho, (ontem, ontem))
+
+    log = ConversationLog(caminho, flush_interval=0.01)
+    log.log({"n": "hoje"})
+    log.close()
+    assert [r["n"] for r in ler_log(caminho)] == ["hoje"]
+    girados = glob.glob(str(tmp_path / "conversas-*.jsonl.gz"))
+    assert [r["n"] for r in ler_log(girados[0])] == ["ontem"]
+
+
+def test_amostra_e_descarta_sob_pressao(tmp_path):
+    liberar = threading.Event()
+
+    def executor_travado(fn, *args):
+        liberar.wait()
+        return fn(*args)
+
+    log = ConversationLog(str(tmp_path / "conversas.jsonl"), max_queue=10, batch_size=1,
+                          high_water=0.5, sample_every=2, executor=executor_travado)
+    aceitos = sum(log.log({"n": i}) for i in range(40))
+    liberar.set()
+    log.close()
+
+    stats = log.stats()
+    assert stats["fora_da_amostra"] > 0
+    assert stats["descartados"] > 0
+    assert aceitos + stats["fora_da_amostra"] + stats["descartados"] == 40
+    assert stats["escritos"] == aceitos == len(ler_todos(tmp_path))
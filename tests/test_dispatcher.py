@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+from dispatcher import FilaCheiaError, UpstreamDispatcher
+
+
+def esperar_ate(condicao, limite=5):
+    prazo = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < prazo, "condição não foi atingida"
+        time.sleep(0.002)
+
+
+def iniciar(fn, *args):
+    thread = threading.Thread(target=fn, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_turnos_da_mesma_sessao_rodam_em_ordem():
+    dispatcher = UpstreamDispatcher()
+    liberar = threading.Event()
+    ordem = []
+
+    def turno(nome):
+        with dispatcher.turno("s1"):
+            ordem.append(nome)
+            if nome == "primeiro":
+                liberar.wait(5)
+
+    threads = [iniciar(turno, "primeiro")]
+    esperar_ate(lambda: ordem == ["primeiro"])
+    for numero, nome in enumerate(["segundo", "terceiro", "quarto"], start=2):
+        threads.append(iniciar(turno, nome))
+        esperar_ate(lambda: dispatcher.pending("s1") == numero)
+
+    # Outra sessão não espera pela s1
+    with dispatcher.turno("s2"):
+        ordem.append("outra")
+
+    liberar.set()
+    for thread in threads:
+        thread.join(5)
+    assert ordem == ["primeiro", "outra", "segundo", "terceiro", "quarto"]
+    assert dispatcher.pending("s1") == 0
+    assert dispatcher.stats()["sessoes_na_fila"] == 0
+
+
+def test_limite_de_chamadas_simultaneas():
+    esperas = []
+    dispatcher = UpstreamDispatcher(max_concurrent=2, max_waiting=10, on_wait=esperas.append)
+    liberar = threading.Event()
+    lock = threading.Lock()
+    rodando = [0, 0]  # agora, pico
+
+    def chamada():
+        with lock:
+            rodando[0] += 1
+            rodando[1] = max(rodando[1], rodando[0])
+        liberar.wait(5)
+        with lock:
+            rodando[0] -= 1
+        return "ok"
+
+    resultados = []
+    threads = [iniciar(lambda: resultados.append(dispatcher.executar(chamada))) for _ in range(5)]
+    esperar_ate(lambda: dispatcher.stats()["aguardando"] == 3)
+    assert dispatcher.stats()["ativos"] == 2
+
+    liberar.set()
+    for thread in threads:
+        thread.join(5)
+    assert resultados == ["ok"] * 5
+    assert rodando[1] == 2
+    assert len(esperas) == 5
+    assert dispatcher.stats() == {"ativos": 0, "aguardando": 0, "sessoes_na_fila": 0,
+                                  "max_concurrent": 2, "max_waiting": 10}
+
+
+def test_fila_cheia_nas_vagas():
+    dispatcher = UpstreamDispatcher(max_concurrent=1, max_waiting=1)
+    liberar = threading.Event()
+    threads = [iniciar(dispatcher.executar, liberar.wait, 5) for _ in range(2)]
+    esperar_ate(lambda: dispatcher.stats()["aguardando"] == 1)
+
+    with pytest.raises(FilaCheiaError):
+        dispatcher.executar(lambda: None)
+
+    liberar.set()
+    for thread in threads:
+        thread.join(5)
+    assert dispatcher.executar(lambda: "ok") == "ok"
+
+
+def test_fila_cheia_nos_turnos():
+    dispatcher = UpstreamDispatcher(max_waiting=1)
+    liberar = threading.Event()
+
+    def turno():
+        with dispatcher.turno("s1"):
+            liberar.wait(5)
+
+    threads = [iniciar(turno)]
+    esperar_ate(lambda: dispatcher.pending("s1") == 1)
+    threads.append(iniciar(turno))
+    esperar_ate(lambda: dispatcher.stats()["aguardando"] == 1)
+
+    with pytest.raises(FilaCheiaError):
+        with dispatcher.turno("s1"):
+            pass
+    # Sessão sem ninguém na frente não precisa esperar, então não é recusada
+    with dispatcher.turno("s2"):
+        pass
+
+    liberar.set()
+    for thread in threads:
+        thread.join(5)
+    assert dispatcher.pending("s1") == 0
@@ -0,0 +1,126 @@
+import pytest
+
+from key_manager import KeyManager, QuotaExcedidaError
+
+
+class RelogioFalso:
+    """Relógio controlado pelo teste: sleep() só avança o tempo."""
+    def __init__(self):
+        self.agora = 0.0
+        self.esperas = []
+
+    def __call__(self):
+        return self.agora
+
+    def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.agora += segundos
+
+
+class Erro429(Exception):
+    code = 429
+
+    def __init__(self, retry_delay="1s"):
+        super().__init__(f"429 RESOURCE_EXHAUSTED {{'retryDelay': '{retry_delay}'}}")
+
+
+class ClientFalso:
+    """Client de uma chave que devolve 429 nas primeiras `falhas` chamadas."""
+    def __init__(self, chave, falhas=0, retry_delay="1s"):
+        self.chave = chave
+        self.falhas = falhas
+        self.retry_delay = retry_delay
+        self.chamadas = 0
+
+    def perguntar(self):
+        self.chamadas += 1
+        if self.chamadas <= self.falhas:
+            raise Erro429(self.retry_delay)
+        return f"resposta de {self.chave}"
+
+
+def criar_manager(falhas, retry_delay="1s", max_wait=10, rpm=60):
+    relogio = RelogioFalso()
+    clients = {}
+
+    def fabrica(chave):
+        clients[chave] = ClientFalso(chave, falhas.get(chave, 0), retry_delay)
+        return clients[chave]
+
+    manager = KeyManager(keys=list(falhas), rpm=rpm, max_wait=max_wait,
+                         client_factory=fabrica, clock=relogio, sleep=relogio.sleep)
+    return manager, clients, relogio
+
+
+def test_repete_em_outra_chave_depois_de_429():
+    manager, clients, relogio = criar_manager({"a": 1, "b": 0})
+
+    resposta = manager.call(lambda client, indice: client.perguntar())
+
+    assert resposta == "resposta de b"
+    estado = {c["indice"]: c for c in manager.stats()["chaves"]}
+    assert estado[0]["erros_429"] == 1
+    assert estado[0]["cooldown_restante"] == 1.0
+    assert manager.trocas == 1
+    assert relogio.esperas == []
+
+
+def test_espera_o_retry_delay_com_uma_chave_so():
+    manager, clients, relogio = criar_manager({"a": 1}, retry_delay="1s", max_wait=10)
+
+    resposta = manager.call(lambda client, indice: client.perguntar())
+
+    assert resposta == "resposta de a"
+    assert clients["a"].chamadas == 2
+    assert relogio.esperas == [1.0]
+
+
+def test_espera_o_cooldown_quando_todas_as_chaves_receberam_429():
+    manager, clients, relogio = criar_manager({"a": 2, "b": 2}, retry_delay="3s", max_wait=10)
+
+    resposta = manager.call(lambda client, indice: client.perguntar())
+
+    assert resposta.startswith("resposta de ")
+    assert sum(relogio.esperas) == pytest.approx(6.0)
+
+
+def test_desiste_quando_o_retry_delay_passa_do_max_wait():
+    manager, clients, relogio = criar_manager({"a": 1}, retry_delay="30s", max_wait=10)
+
+    with pytest.raises(QuotaExcedidaError) as erro:
+        manager.call(lambda client, indice: client.perguntar())
+
+    assert isinstance(erro.value.__cause__, Erro429)
+    assert relogio.esperas == []
+    assert manager.stats()["chaves"][0]["em_uso"] == 0
+
+
+def test_erro_que_nao_e_429_nao_e_repetido():
+    manager, clients, relogio = criar_manager({"a": 0, "b": 0})
+
+    def falhar(client, indice):
+        raise ValueError("quebrou")
+
+    with pytest.raises(ValueError):
+        manager.call(falhar)
+    assert sum(c["requisicoes"] for c in manager.stats()["chaves"]) == 1
+
+
+def test_escolhe_a_chave_menos_ocupada():
+    manager, clients, relogio = criar_manager({"a": 0, "b": 0, "c": 0})
+
+    primeiras = [manager.acquire() for _ in range(3)]
+    assert sorted(primeiras) == [0, 1, 2]
+
+    manager.release(1)
+    assert manager.acquire() == 1
+
+
+def test_respeita_o_orcamento_por_minuto():
+    manager, clients, relogio = criar_manager({"a": 0}, rpm=2, max_wait=60)
+
+    for _ in range(3):
+        manager.release(manager.acquire())
+
+    # A terceira requisição precisou esperar um token novo (60 / 2 = 30s)
+    assert relogio.esperas == [pytest.approx(30.0)]
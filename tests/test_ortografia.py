@@ -0,0 +1,69 @@
+import pytest
+
+import ortografia
+from ortografia import PARES_CONFUSOS, responder_localmente
+
+
+def explicacao_do_grupo(palavra):
+    return next(explicacao for grupo, explicacao in PARES_CONFUSOS if palavra in grupo)
+
+
+@pytest.fixture
+def sem_indice(monkeypatch):
+    monkeypatch.setattr(ortografia, "_indice", None)
+    monkeypatch.setattr(ortografia, "_indice_carregado", True)
+
+
+@pytest.mark.parametrize("mensagem, grupo", [
+    ("mas ou mais?", "mas"),
+    ("Oi, é mal ou mau?", "mal"),
+    ("é há ou a?", "há"),
+    ("ha ou a", "há"),
+    ("sessao ou secao?", "sessão"),
+    ("qual o certo: porque ou por que?", "porque"),
+])
+def test_responde_pares_confusos(sem_indice, mensagem, grupo):
+    assert responder_localmente(mensagem) == explicacao_do_grupo(grupo)
+
+
+def test_responde_erro_comum(sem_indice):
+    assert responder_localmente("excessão ou exceção?").startswith("O certo é exceção.")
+    assert responder_localmente("como se escreve excessão?").startswith("O certo é exceção.")
+
+
+@pytest.mark.parametrize("mensagem", [
+    "a ou à?",
+    "é há ou à?",
+    "mas ou más?",
+    "mais ou más?",
+    "chá ou café?",
+    "como se escreve paralelepípedo?",
+    "me explica a diferença entre mas e mais " * 5,
+])
+def test_quase_pares_vao_para_o_gemini(sem_indice, mensagem):
+    assert responder_localmente(mensagem) is None
+
+
+@pytest.fixture
+def com_indice(monkeypatch, tmp_path):
+    lista = tmp_path / "palavras.dic"
+    lista.write_text("\n".join(["sessão", "seção", "cessão", "conserto", "concerto", "casa", "você"]),
+                     encoding="utf-8")
+    caminho = str(tmp_path / "palavras.idx")
+    ortografia.compilar_indice(str(lista), caminho)
+    monkeypatch.setattr(ortografia, "_indice", ortografia.IndicePalavras(caminho))
+    monkeypatch.setattr(ortografia, "_indice_carregado", True)
+
+
+@pytest.mark.parametrize("mensagem, grupo", [
+    ("como se escreve sessão?", "sessão"),
+    ("como se escreve concerto?", "conserto"),
+    ("a palavra secao está certa?", "seção"),
+])
+def test_palavra_de_grupo_confuso_recebe_a_explicacao(com_indice, mensagem, grupo):
+    assert responder_localmente(mensagem) == explicacao_do_grupo(grupo)
+
+
+def test_palavra_pela_lista(com_indice):
+    assert responder_localmente("como se escreve casa?") == "Casa está escrita corretamente!"
+    assert responder_localmente("como se escreve voce?") == "O certo é você, com acento."
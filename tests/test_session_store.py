@@ -0,0 +1,174 @@
+from google.genai import types
+
+from session_store import RedisSessionStore, SqliteSessionStore
+
+
+class RelogioFalso:
+    def __init__(self):
+        self.agora = 1_000_000.0
+
+    def __call__(self):
+        return self.agora
+
+
+class RedisFalso:
+    """Substituto do Redis guardado num dict, com TTL pelo relógio do teste."""
+    def __init__(self, relogio):
+        self._relogio = relogio
+        self._dados = {}
+        self._expira = {}
+
+    def _viva(self, chave):
+        prazo = self._expira.get(chave)
+        if prazo is not None and self._relogio() >= prazo:
+            self._dados.pop(chave, None)
+            self._expira.pop(chave, None)
+        return chave in self._dados
+
+    def get(self, chave):
+        return self._dados[chave] if self._viva(chave) else None
+
+    def set(self, chave, valor, ex=None):
+        self._dados[chave] = valor.encode("utf-8") if isinstance(valor, str) else valor
+        self._expira.pop(chave, None)
+        if ex is not None:
+            self._expira[chave] = self._relogio() + ex
+
+    def delete(self, *chaves):
+        for chave in chaves:
+            self._dados.pop(chave, None)
+            self._expira.pop(chave, None)
+
+    def expire(self, chave, segundos):
+        if self._viva(chave):
+            self._expira[chave] = self._relogio() + segundos
+
+    def incr(self, chave):
+        valor = int(self._dados[chave]) + 1 if self._viva(chave) else 1
+        self._dados[chave] = str(valor).encode()
+        return valor
+
+    def decr(self, chave):
+        valor = int(self._dados[chave]) - 1 if self._viva(chave) else -1
+        self._dados[chave] = str(valor).encode()
+        return valor
+
+
+def historico(texto="oi"):
+    return [
+        types.Content(role="user", parts=[types.Part(text=texto)]),
+        types.Content(role="model", parts=[types.Part(text="olá!")]),
+    ]
+
+
+def criar_sqlite(tmp_path, relogio):
+    return SqliteSessionStore(str(tmp_path / "sessoes.db"), ttl=1800, disconnect_grace=10,
+                              clock=relogio)
+
+
+def criar_redis(tmp_path, relogio):
+    return RedisSessionStore("redis://falso", ttl=1800, disconnect_grace=10,
+                             client=RedisFalso(relogio))
+
+
+def _verificar_ciclo_de_vida(store, relogio):
+    store.put("s1", historico("como se escreve exceção?"))
+    recuperado = store.get("s1")
+    assert [c.parts[0].text for c in recuperado] == ["como se escreve exceção?", "olá!"]
+
+    # Duas abas na mesma sessão; fechar uma não inicia o período de graça
+    store.mark_connected("s1")
+    store.mark_connected("s1")
+    store.mark_disconnected("s1")
+    relogio.agora += 11
+    assert store.get("s1") is not None
+
+    # Fechar a última inicia
+    store.mark_disconnected("s1")
+    relogio.agora += 5
+    assert store.get("s1") is not None
+    relogio.agora += 6
+    assert store.get("s1") is None
+
+
+def _verificar_reconexao(store, relogio):
+    store.put("s2", historico())
+    store.mark_connected("s2")
+    store.mark_disconnected("s2")
+    relogio.agora += 5
+    store.mark_connected("s2")
+    relogio.agora += 60
+    assert store.get("s2") is not None
+
+
+def _verificar_ttl(store, relogio):
+    store.put("s3", historico())
+    store.mark_connected("s3")
+    relogio.agora += 1801
+    assert store.get("s3") is None
+
+
+def test_sqlite_ciclo_de_vida(tmp_path):
+    relogio = RelogioFalso()
+    _verificar_ciclo_de_vida(criar_sqlite(tmp_path, relogio), relogio)
+
+
+def test_sqlite_reconexao_cancela_a_graca(tmp_path):
+    relogio = RelogioFalso()
+    _verificar_reconexao(criar_sqlite(tmp_path, relogio), relogio)
+
+
+def test_sqlite_ttl(tmp_path):
+    relogio = RelogioFalso()
+    _verificar_ttl(criar_sqlite(tmp_path, relogio), relogio)
+
+
+def test_sqlite_conexoes_valem_entre_workers(tmp_path):
+    relogio = RelogioFalso()
+    worker_a = criar_sqlite(tmp_path, relogio)
+    worker_b = criar_sqlite(tmp_path, relogio)
+    worker_a.put("s1", historico())
+    worker_a.mark_connected("s1")
+    worker_b.mark_connected("s1")
+    worker_a.mark_disconnected("s1")
+    relogio.agora += 11
+    assert worker_b.get("s1") is not None
+
+
+def test_sqlite_usa_o_executor(tmp_path):
+    chamadas = []
+
+    def executor(fn, *args):
+        chamadas.append(fn.__name__)
+        return fn(*args)
+
+    store = SqliteSessionStore(str(tmp_path / "sessoes.db"), executor=executor)
+    store.put("s1", historico())
+    store.get("s1")
+    assert chamadas == ["_gravar", "_buscar"]
+
+
+def test_redis_ciclo_de_vida(tmp_path):
+    relogio = RelogioFalso()
+    _verificar_ciclo_de_vida(criar_redis(tmp_path, relogio), relogio)
+
+
+def test_redis_reconexao_cancela_a_graca(tmp_path):
+    relogio = RelogioFalso()
+    _verificar_reconexao(criar_redis(tmp_path, relogio), relogio)
+
+
+def test_redis_ttl(tmp_path):
+    relogio = RelogioFalso()
+    _verificar_ttl(criar_redis(tmp_path, relogio), relogio)
+
+
+def test_redis_remove_apaga_a_contagem(tmp_path):
+    relogio = RelogioFalso()
+    client = RedisFalso(relogio)
+    store = RedisSessionStore("redis://falso", client=client)
+    store.put("s1", historico())
+    store.mark_connected("s1")
+    store.remove("s1")
+    assert store.get("s1") is None
+    assert client.get(RedisSessionStore.PREFIXO_CONEXOES + "s1") is None